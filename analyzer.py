@@ -1,24 +1,39 @@
 import json
 import asyncio
+import os
+import socket
+import uuid
 from datetime import datetime
 from typing import List, Optional, Dict
 import logging
 import openai
-from openai import AsyncOpenAI
+from bson import ObjectId
 
 from config import settings
 from models import NewsItem, AnalysisResult, StockInfo
 from database import db
+from llm_client import llm_client
+from llm_cache import analysis_cache
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+ANALYST_SYSTEM_PROMPT = "你是一个专业的A股市场分析师，擅长分析财经新闻对股市的影响。"
+
+# 分析结果的必需字段
+ANALYSIS_FIELDS = [
+    'sentiment_score', 'sentiment_desc', 'affected_sectors',
+    'affected_concepts', 'related_stocks', 'time_range',
+    'importance', 'summary'
+]
+
 class NewsAnalyzer:
     def __init__(self):
-        self.client = AsyncOpenAI(
-            api_key=settings.OPENAI_API_KEY,
-            base_url=settings.OPENAI_BASE_URL
-        )
+        # 进程内共享的LLM客户端，所有分析请求共用同一份配额
+        self.llm = llm_client
+        self.cache = analysis_cache
+        # 认领新闻时使用的租约持有者标识
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
         
         # A股板块和概念映射
         self.sector_concepts = {
@@ -34,43 +49,142 @@ class NewsAnalyzer:
             "化工": ["石油化工", "精细化工", "农药化肥"],
         }
     
-    async def analyze_all_unprocessed(self):
-        """分析所有未处理的新闻"""
-        news_items = await db.get_unprocessed_news(limit=50)
-        logger.info(f"开始分析 {len(news_items)} 条新闻")
+    async def analyze_all_unprocessed(self, limit: Optional[int] = None):
+        """
+        认领并并发分析待处理的新闻，最多limit条（默认 ANALYSIS_BATCH_SIZE）。
+        
+        ANALYSIS_CONCURRENCY 个协程各自循环认领、分析，速度只受LLM客户端的配额限速约束；
+        新闻在轮到时才认领，不会因排队等待而让租约过期。开启批量分析时，每个协程把认领到的
+        短新闻按token预算攒成一批，用一次请求分析。
+        """
+        limit = limit or settings.ANALYSIS_BATCH_SIZE
+        logger.info(f"开始分析新闻（工作进程 {self.worker_id}）")
         
         results = []
-        for item in news_items:
+        claimed = 0
+        
+        async def process(items: List[NewsItem]):
             try:
-                result = await self.analyze_news(item)
-                if result:
-                    results.append(result)
-                await db.mark_news_processed(str(item.id))
-                await asyncio.sleep(1)  # 避免API调用过快
+                analyzed = await self.analyze_batch(items)
             except Exception as e:
-                logger.error(f"分析新闻 {item.title} 时出错: {e}")
+                # 不释放租约，租约到期后由任意工作进程重试
+                logger.error(f"分析 {len(items)} 条新闻时出错: {e}")
+                return
+            for item in items:
+                if item.id not in analyzed:
+                    continue
+                if analyzed[item.id]:
+                    results.append(analyzed[item.id])
+                await db.complete_news(str(item.id), self.worker_id)
+        
+        async def worker():
+            nonlocal claimed
+            batch: List[NewsItem] = []
+            used = 0
+            while claimed < limit:
+                claimed += 1
+                item = await db.claim_news(self.worker_id)
+                if item is None:
+                    break
+                cost = self.article_tokens(item)
+                if batch and (not settings.ANALYSIS_PROMPT_BATCHING
+                              or used + cost > settings.ANALYSIS_PROMPT_BATCH_TOKENS
+                              or len(batch) >= settings.ANALYSIS_PROMPT_BATCH_MAX_ARTICLES):
+                    await process(batch)
+                    batch, used = [], 0
+                batch.append(item)
+                used += cost
+            if batch:
+                await process(batch)
+        
+        await asyncio.gather(*(worker() for _ in range(min(limit, settings.ANALYSIS_CONCURRENCY))))
         
         logger.info(f"完成分析，生成 {len(results)} 个分析结果")
         return results
     
-    async def analyze_news(self, news_item: NewsItem) -> Optional[AnalysisResult]:
-        """分析单条新闻"""
+    async def run_worker(self):
+        """持续认领并分析新闻，可在多个进程或主机上同时运行"""
+        logger.info(f"分析工作进程 {self.worker_id} 启动")
+        while True:
+            try:
+                results = await self.analyze_all_unprocessed()
+                if not results:
+                    await asyncio.sleep(settings.ANALYSIS_WORKER_IDLE_SECONDS)
+            except Exception as e:
+                logger.error(f"分析工作进程出错: {e}")
+                await asyncio.sleep(settings.ANALYSIS_WORKER_IDLE_SECONDS)
+    
+    def article_text(self, news_item: NewsItem) -> str:
+        return f"标题: {news_item.title}\n\n内容: {news_item.content[:2000]}"
+    
+    def article_tokens(self, news_item: NewsItem) -> int:
+        """估计一条新闻在提示词中占用的token数（中文约一字一token）"""
+        return len(self.article_text(news_item))
+    
+    def cache_key(self, news_item: NewsItem) -> str:
+        return self.cache.key(news_item.title, news_item.content)
+    
+    def analysis_tokens(self, news_item: NewsItem, analysis_data: Dict) -> int:
+        """估计单独分析一条新闻消耗的token数，用于统计缓存节省的token"""
+        return (len(ANALYST_SYSTEM_PROMPT) + len(settings.ANALYSIS_PROMPT_TEMPLATE) + self.article_tokens(news_item)
+                + len(json.dumps(analysis_data, ensure_ascii=False)))
+    
+    async def cache_analysis(self, news_item: NewsItem, analysis_data: Dict):
+        await self.cache.put(self.cache_key(news_item), analysis_data, self.analysis_tokens(news_item, analysis_data))
+    
+    async def reuse_analysis(self, news_item: NewsItem) -> Optional[AnalysisResult]:
+        """已分析过、可复用原始新闻的分析结果或命中分析缓存时直接返回，否则返回None"""
+        # 检查是否已经分析过
+        existing = await db.get_analysis_by_news_id(str(news_item.id))
+        if existing:
+            return existing
+        
+        # 近似重复的转载新闻直接复用原始新闻的分析结果
+        if news_item.canonical_id:
+            canonical = await db.get_analysis_by_news_id(str(news_item.canonical_id))
+            if canonical:
+                result = canonical.model_copy(update={
+                    "id": ObjectId(),
+                    "news_id": news_item.id,
+                    "analysis_time": datetime.now(),
+                    "reused_from": canonical.id
+                })
+                await db.create_analysis_result(result)
+                logger.info(f"复用原始新闻的分析结果: {news_item.title}")
+                return result
+        
+        # 内容相同的新闻（重新爬取、URL变化、通稿）直接使用缓存的分析结果
+        cached = await self.cache.get(self.cache_key(news_item))
+        if cached:
+            logger.info(f"命中分析缓存: {news_item.title}")
+            return await self.save_analysis(news_item, cached)
+        return None
+    
+    async def save_analysis(self, news_item: NewsItem, analysis_data: Dict) -> AnalysisResult:
+        """补充股票信息并保存分析结果"""
+        analysis_data = await self.enrich_stock_info(analysis_data)
+        result = AnalysisResult(
+            news_id=news_item.id,
+            **analysis_data
+        )
+        await db.create_analysis_result(result)
+        logger.info(f"成功分析新闻: {news_item.title}, 重要性: {result.importance}星")
+        return result
+    
+    async def analyze_news(self, news_item: NewsItem, reuse: bool = True) -> Optional[AnalysisResult]:
+        """分析单条新闻，reuse为False时跳过已有结果和缓存的检查（调用方已检查过）"""
         try:
-            # 检查是否已经分析过
-            existing = await db.get_analysis_by_news_id(str(news_item.id))
-            if existing:
-                return existing
+            reused = await self.reuse_analysis(news_item) if reuse else None
+            if reused:
+                return reused
             
             # 构建分析提示
-            prompt = settings.ANALYSIS_PROMPT_TEMPLATE.format(
-                content=f"标题: {news_item.title}\n\n内容: {news_item.content[:2000]}"
-            )
+            prompt = settings.ANALYSIS_PROMPT_TEMPLATE.format(content=self.article_text(news_item))
             
             # 调用OpenAI API
-            response = await self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
+            content = await self.llm.chat(
                 messages=[
-                    {"role": "system", "content": "你是一个专业的A股市场分析师，擅长分析财经新闻对股市的影响。"},
+                    {"role": "system", "content": ANALYST_SYSTEM_PROMPT},
                     {"role": "user", "content": prompt}
                 ],
                 temperature=0.1,
@@ -78,70 +192,141 @@ class NewsAnalyzer:
             )
             
             # 解析响应
-            content = response.choices[0].message.content
             analysis_data = self.parse_analysis_response(content)
             
             if not analysis_data:
                 logger.warning(f"无法解析分析结果: {content}")
                 return None
             
-            # 补充股票信息
-            analysis_data = await self.enrich_stock_info(analysis_data)
-            
-            # 创建分析结果
-            result = AnalysisResult(
-                news_id=news_item.id,
-                **analysis_data
-            )
-            
-            # 保存到数据库
-            result_id = await db.create_analysis_result(result)
-            logger.info(f"成功分析新闻: {news_item.title}, 重要性: {result.importance}星")
-            
-            return result
+            await self.cache_analysis(news_item, analysis_data)
+            return await self.save_analysis(news_item, analysis_data)
             
+        except openai.APIError:
+            # 重试后仍失败（限流、服务端错误），交给调用方保留租约稍后重试
+            raise
         except Exception as e:
             logger.error(f"分析新闻时出错: {e}")
             return None
     
-    def parse_analysis_response(self, content: str) -> Optional[Dict]:
-        """解析AI分析响应"""
+    async def analyze_batch(self, news_items: List[NewsItem]) -> Dict[ObjectId, Optional[AnalysisResult]]:
+        """
+        用一次请求分析多条新闻，返回 新闻ID -> 分析结果（无法解析时为None）。
+        
+        批量结果中缺失或校验失败的新闻单独重新分析；单独分析时调用失败的新闻不在返回值中，
+        由调用方保留租约稍后重试。整批请求调用失败时抛出异常。
+        """
+        analyzed: Dict[ObjectId, Optional[AnalysisResult]] = {}
+        pending = []
+        for item in news_items:
+            reused = await self.reuse_analysis(item)
+            if reused:
+                analyzed[item.id] = reused
+            else:
+                pending.append(item)
+        
+        if len(pending) > 1:
+            articles = "\n\n".join(
+                f"【{index}】\n{self.article_text(item)}" for index, item in enumerate(pending, 1)
+            )
+            content = await self.llm.chat(
+                messages=[
+                    {"role": "system", "content": ANALYST_SYSTEM_PROMPT},
+                    {"role": "user", "content": settings.ANALYSIS_BATCH_PROMPT_TEMPLATE.format(
+                        count=len(pending), articles=articles
+                    )}
+                ],
+                temperature=0.1,
+                max_tokens=settings.ANALYSIS_PROMPT_BATCH_OUTPUT_TOKENS * len(pending)
+            )
+            entries = self.parse_analysis_response(content, ids=[str(index) for index in range(1, len(pending) + 1)])
+            
+            retry = []
+            for index, item in enumerate(pending, 1):
+                data = entries.get(str(index))
+                if data is None:
+                    retry.append(item)
+                    continue
+                try:
+                    await self.cache_analysis(item, data)
+                    analyzed[item.id] = await self.save_analysis(item, data)
+                except Exception as e:
+                    logger.error(f"保存分析结果时出错: {e}")
+                    retry.append(item)
+            if retry:
+                logger.warning(f"批量分析中 {len(retry)}/{len(pending)} 条结果无效，单独重新分析")
+            pending = retry
+        
+        for item in pending:
+            try:
+                # 上面已检查过已有结果和缓存，重新分析时不再查找，避免重复计入缓存未命中
+                analyzed[item.id] = await self.analyze_news(item, reuse=False)
+            except openai.APIError as e:
+                logger.error(f"分析新闻 {item.title} 时出错: {e}")
+        return analyzed
+    
+    def validate_analysis_data(self, data) -> Optional[Dict]:
+        """检查必需字段并清洗一条分析结果"""
+        if not isinstance(data, dict):
+            logger.warning(f"分析结果不是JSON对象: {data}")
+            return None
+        
+        # 验证必需字段
+        for field in ANALYSIS_FIELDS:
+            if field not in data:
+                logger.warning(f"分析结果缺少字段: {field}")
+                return None
+        
+        try:
+            # 数据清洗和验证，只保留模型字段
+            data = {field: data[field] for field in ANALYSIS_FIELDS}
+            data['sentiment_score'] = max(1, min(10, int(data['sentiment_score'])))
+            data['importance'] = max(1, min(5, int(data['importance'])))
+            data['affected_sectors'] = [s.strip() for s in data['affected_sectors'] if s.strip()]
+            data['affected_concepts'] = [c.strip() for c in data['affected_concepts'] if c.strip()]
+            data['related_stocks'] = [s.strip() for s in data['related_stocks'] if s.strip() and len(s.strip()) == 6]
+        except (TypeError, ValueError, AttributeError) as e:
+            logger.warning(f"分析结果字段无效: {e}")
+            return None
+        return data
+    
+    def parse_analysis_response(self, content: str, ids: Optional[List[str]] = None) -> Optional[Dict]:
+        """
+        解析AI分析响应。
+        
+        ids为空时解析单条结果（JSON对象），返回清洗后的字段或None；否则解析批量结果（JSON数组），
+        按id字段拆分，返回 id -> 字段，只包含ids中且校验通过的条目。
+        """
+        batch = ids is not None
+        open_char, close_char = ("[", "]") if batch else ("{", "}")
         try:
             # 尝试提取JSON部分
-            json_start = content.find('{')
-            json_end = content.rfind('}') + 1
+            json_start = content.find(open_char)
+            json_end = content.rfind(close_char) + 1
             
             if json_start >= 0 and json_end > json_start:
-                json_str = content[json_start:json_end]
-                data = json.loads(json_str)
-                
-                # 验证必需字段
-                required_fields = [
-                    'sentiment_score', 'sentiment_desc', 'affected_sectors',
-                    'affected_concepts', 'related_stocks', 'time_range',
-                    'importance', 'summary'
-                ]
+                data = json.loads(content[json_start:json_end])
+                if not batch:
+                    return self.validate_analysis_data(data)
                 
-                for field in required_fields:
-                    if field not in data:
-                        logger.warning(f"分析结果缺少字段: {field}")
-                        return None
-                
-                # 数据清洗和验证
-                data['sentiment_score'] = max(1, min(10, int(data['sentiment_score'])))
-                data['importance'] = max(1, min(5, int(data['importance'])))
-                data['affected_sectors'] = [s.strip() for s in data['affected_sectors'] if s.strip()]
-                data['affected_concepts'] = [c.strip() for c in data['affected_concepts'] if c.strip()]
-                data['related_stocks'] = [s.strip() for s in data['related_stocks'] if s.strip() and len(s.strip()) == 6]
-                
-                return data
+                if not isinstance(data, list):
+                    logger.warning("批量分析结果不是JSON数组")
+                    return {}
+                entries = {}
+                for entry in data:
+                    entry_id = str(entry.get("id")) if isinstance(entry, dict) else None
+                    if entry_id not in ids or entry_id in entries:
+                        continue
+                    entry = self.validate_analysis_data(entry)
+                    if entry:
+                        entries[entry_id] = entry
+                return entries
             
         except json.JSONDecodeError as e:
             logger.error(f"JSON解析错误: {e}")
         except Exception as e:
             logger.error(f"解析分析响应时出错: {e}")
         
-        return None
+        return {} if batch else None
     
     async def enrich_stock_info(self, analysis_data: Dict) -> Dict:
         """丰富股票信息"""
@@ -184,14 +369,14 @@ class NewsAnalyzer:
         """生成市场总结"""
         try:
             # 获取最近重要分析
-            important_analysis = await db.get_important_analysis(min_importance=4)
+            important_analysis = await db.get_important_analysis(min_importance=4, limit=10)  # 最多10条
             
             if not important_analysis:
                 return "今日暂无重要市场消息。"
             
             # 构建总结提示
             news_summaries = []
-            for analysis in important_analysis[:10]:  # 最多10条
+            for analysis in important_analysis:
                 # 这里暂时简化，实际需要实现get_news_by_id方法
                 news_summaries.append(f"• 重要消息 - {analysis.summary}")
             
@@ -207,8 +392,7 @@ class NewsAnalyzer:
             4. 投资建议（谨慎表述）
             """
             
-            response = await self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
+            content = await self.llm.chat(
                 messages=[
                     {"role": "system", "content": "你是专业的股市分析师，要生成简洁准确的市场总结。"},
                     {"role": "user", "content": prompt}
@@ -217,7 +401,7 @@ class NewsAnalyzer:
                 max_tokens=500
             )
             
-            return response.choices[0].message.content.strip()
+            return content.strip()
             
         except Exception as e:
             logger.error(f"生成市场总结时出错: {e}")
@@ -1,16 +1,21 @@
 from fastapi import FastAPI, HTTPException, BackgroundTasks
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
+import json
 import uvicorn
 from typing import List, Optional
-from datetime import datetime, timedelta
+from datetime import datetime
+from bson import ObjectId
 
 from config import settings
-from models import NewsItem, AnalysisResult, Subscriber
-from database import db
+from models import NewsSource, Subscriber, NewsItemList, AnalysisResultList, SubscriberList
+from database import db, encode_page_token
 from crawler import NewsCrawler
+from http_client import get_host_stats
+from llm_client import llm_client
 from analyzer import NewsAnalyzer
 from notifier import notifier
+from indexes import bootstrap_indexes
 
 app = FastAPI(title="StockTracker", description="A股市场监控系统")
 
@@ -18,6 +23,8 @@ app = FastAPI(title="StockTracker", description="A股市场监控系统")
 async def startup_event():
     """应用启动事件"""
     print("StockTracker 启动中...")
+    await bootstrap_indexes()
+    await db.check_stats()
     
 @app.on_event("shutdown")
 async def shutdown_event():
@@ -102,25 +109,84 @@ async def home():
     return html_content
 
 # 新闻相关API
-@app.get("/news", response_model=List[NewsItem])
-async def get_news(limit: int = 20, hours: int = 24):
-    """获取最新新闻"""
+def json_default(value):
+    """原始文档中的ObjectId和时间转为字符串"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"无法序列化 {type(value).__name__}")
+
+async def stream_page(cursor, limit: int, sort_field: Optional[str] = None):
+    """
+    把游标中的原始文档逐条编码输出为 {"items": [...], "next_cursor": ...}。
+    
+    本页条数达到limit时用最后一条的排序键生成续页令牌，否则next_cursor为null。
+    """
+    yield b'{"items":['
+    count = 0
+    last = None
+    async for doc in cursor:
+        if count:
+            yield b","
+        count += 1
+        last = doc
+        yield json.dumps(doc, ensure_ascii=False, default=json_default).encode("utf-8")
+    
+    next_cursor = encode_page_token(last, sort_field) if last is not None and count >= limit else None
+    yield b'],"next_cursor":' + json.dumps(next_cursor).encode("utf-8") + b"}"
+
+def next_page_token(items: List, limit: int, sort_field: Optional[str] = None) -> Optional[str]:
+    """完整模型列表的续页令牌"""
+    if not items or len(items) < limit:
+        return None
+    return encode_page_token(items[-1].model_dump(by_alias=True), sort_field)
+
+def page_response(adapter, items: List, next_cursor: Optional[str], key: str = "items", **fields) -> Response:
+    """用TypeAdapter一次性把整页模型编码为JSON，不逐个转换为字典"""
+    head = b"".join(json.dumps(name).encode("utf-8") + b":" + json.dumps(value).encode("utf-8") + b"," for name, value in fields.items())
+    body = (b"{" + head + json.dumps(key).encode("utf-8") + b":" + adapter.dump_json(items, by_alias=True)
+            + b',"next_cursor":' + json.dumps(next_cursor).encode("utf-8") + b"}")
+    return Response(body, media_type="application/json")
+
+def page_size(limit: int) -> int:
+    return max(1, min(limit, settings.API_MAX_PAGE_SIZE))
+
+@app.get("/news")
+async def get_news(limit: int = 20, hours: int = 24, cursor: Optional[str] = None, full: bool = False):
+    """
+    获取最新新闻，按 (publish_time, _id) 倒序分页。
+    
+    默认为不含正文的列表视图，full=true返回完整新闻；把返回的next_cursor作为cursor参数获取下一页。
+    """
     try:
-        news = await db.get_recent_news(hours=hours, limit=limit)
-        return news
+        limit = page_size(limit)
+        if full:
+            news = await db.get_recent_news(hours=hours, limit=limit, after=cursor)
+            return page_response(NewsItemList, news, next_page_token(news, limit, "publish_time"))
+        docs = db.find_recent_news_docs(hours=hours, limit=limit, after=cursor)
+        return StreamingResponse(stream_page(docs, limit, "publish_time"), media_type="application/json")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/analysis", response_model=List[AnalysisResult])
-async def get_analysis(min_importance: int = 1, limit: int = 20):
-    """获取分析结果"""
+@app.get("/analysis")
+async def get_analysis(min_importance: int = 1, limit: int = 20, cursor: Optional[str] = None, full: bool = False):
+    """
+    获取分析结果，按 (analysis_time, _id) 倒序分页。
+    
+    默认为列表视图，full=true返回完整分析结果；把返回的next_cursor作为cursor参数获取下一页。
+    """
     try:
-        if min_importance > 1:
-            results = await db.get_important_analysis(min_importance=min_importance)
-        else:
-            # 获取所有分析结果的逻辑需要在database.py中实现
-            results = await db.get_important_analysis(min_importance=1)
-        return results[:limit]
+        limit = page_size(limit)
+        if full:
+            results = await db.get_important_analysis(min_importance=min_importance, limit=limit, after=cursor)
+            return page_response(AnalysisResultList, results, next_page_token(results, limit, "analysis_time"))
+        docs = db.find_important_analysis_docs(min_importance=min_importance, limit=limit, after=cursor)
+        return StreamingResponse(stream_page(docs, limit, "analysis_time"), media_type="application/json")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -134,6 +200,25 @@ async def get_market_summary():
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# 新闻源管理API
+@app.post("/sources")
+async def add_news_source(source: NewsSource):
+    """添加或更新新闻源定义（按url匹配），无需改代码即可接入新站点"""
+    try:
+        if source.listing_format not in ("rss", "html", "json"):
+            raise HTTPException(status_code=400, detail="listing_format 必须是 rss、html 或 json")
+        if source.listing_format == "html" and not source.item_selector:
+            raise HTTPException(status_code=400, detail="html 新闻源需要 item_selector")
+        if source.listing_format == "json" and not source.json_items_path:
+            raise HTTPException(status_code=400, detail="json 新闻源需要 json_items_path")
+        
+        source_id = await db.upsert_news_source(source)
+        return {"message": "新闻源已保存", "source_id": source_id}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 # 订阅管理API
 @app.post("/subscribe")
 async def subscribe(
@@ -165,11 +250,17 @@ async def subscribe(
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/subscribers")
-async def get_subscribers():
-    """获取订阅者列表"""
+async def get_subscribers(limit: int = 50, cursor: Optional[str] = None):
+    """获取订阅者列表，按 _id 分页"""
     try:
-        subscribers = await db.get_active_subscribers()
-        return {"count": len(subscribers), "subscribers": subscribers}
+        limit = page_size(limit)
+        subscribers = await db.get_active_subscribers(limit=limit, after=cursor)
+        return page_response(
+            SubscriberList, subscribers, next_page_token(subscribers, limit),
+            key="subscribers", count=len(subscribers)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -179,7 +270,7 @@ async def manual_crawl(background_tasks: BackgroundTasks):
     """手动触发爬虫"""
     async def crawl_task():
         async with NewsCrawler() as crawler:
-            await crawler.crawl_all_sources()
+            await crawler.crawl_all_sources(force=True)
     
     background_tasks.add_task(crawl_task)
     return {"message": "爬虫任务已启动"}
@@ -208,14 +299,14 @@ async def manual_notify(background_tasks: BackgroundTasks):
 async def get_stats():
     """获取系统统计信息"""
     try:
-        # 这里需要在database.py中实现统计查询方法
-        stats = {
-            "total_news": 0,  # await db.count_news()
-            "total_analysis": 0,  # await db.count_analysis()
-            "active_subscribers": len(await db.get_active_subscribers()),
+        # 计数在写入时增量维护，集合总数取自集合元数据
+        stats = await db.get_stats_snapshot()
+        stats.update({
+            "crawler_hosts": get_host_stats(),
+            "llm": dict(llm_client.stats),
             "system_status": "running",
             "last_update": datetime.now()
-        }
+        })
         return stats
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
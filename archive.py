@@ -0,0 +1,179 @@
+"""
+原始网页压缩归档
+
+爬虫抓取的正文页原始字节按内容哈希去重后，逐条压缩成独立的zstd帧追加写入分段文件，
+偏移索引记录每条内容所在的分段、偏移和长度，读取时通过mmap直接定位解压。
+抽取规则变化后可用 reextract_archive 并行重新抽取正文并更新 news_items，无需重新爬取。
+"""
+
+import asyncio
+import hashlib
+import json
+import mmap
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+import logging
+
+import zstandard
+from pymongo import UpdateOne
+
+from config import settings
+from database import db
+from extractor import extract_article_text, extract_article_text_streaming
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SEGMENT_PATTERN = "segment-{:06d}.zst"
+
+# 每个进程内打开的分段文件映射
+_segment_maps: Dict[str, mmap.mmap] = {}
+
+
+def read_record(directory: str, segment: int, offset: int, length: int) -> bytes:
+    """从分段文件中读取并解压一条内容"""
+    path = str(Path(directory) / SEGMENT_PATTERN.format(segment))
+    mapped = _segment_maps.get(path)
+    if mapped is None or len(mapped) < offset + length:
+        # 分段仍在追加时重新映射
+        if mapped is not None:
+            mapped.close()
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        _segment_maps[path] = mapped
+    return zstandard.ZstdDecompressor().decompress(mapped[offset:offset + length])
+
+
+class HtmlArchive:
+    """内容寻址的原始网页归档"""
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.directory / "index.jsonl"
+        self.urls_path = self.directory / "urls.jsonl"
+        self.compressor = zstandard.ZstdCompressor(level=settings.ARCHIVE_COMPRESSION_LEVEL)
+        self.lock = threading.Lock()
+
+        # 内容哈希 -> (分段, 偏移, 长度)
+        self.records: Dict[str, Tuple[int, int, int]] = {}
+        # URL -> (内容哈希, 编码)
+        self.urls: Dict[str, Tuple[str, Optional[str]]] = {}
+        self.load()
+
+        self.segment = max([record[0] for record in self.records.values()], default=1)
+        self.segment_path = self.directory / SEGMENT_PATTERN.format(self.segment)
+
+    def load(self):
+        if self.index_path.exists():
+            with open(self.index_path, encoding="utf-8") as f:
+                for line in f:
+                    record = json.loads(line)
+                    self.records[record["hash"]] = (record["segment"], record["offset"], record["length"])
+        if self.urls_path.exists():
+            with open(self.urls_path, encoding="utf-8") as f:
+                for line in f:
+                    record = json.loads(line)
+                    self.urls[record["url"]] = (record["hash"], record.get("charset"))
+
+    def put(self, url: str, body: bytes, charset: Optional[str] = None) -> str:
+        """归档一条网页内容，相同内容只保存一份"""
+        content_hash = hashlib.sha256(body).hexdigest()
+        with self.lock:
+            if content_hash not in self.records:
+                frame = self.compressor.compress(body)
+                if self.segment_path.exists() and self.segment_path.stat().st_size + len(frame) > settings.ARCHIVE_SEGMENT_BYTES:
+                    self.segment += 1
+                    self.segment_path = self.directory / SEGMENT_PATTERN.format(self.segment)
+
+                with open(self.segment_path, "ab") as f:
+                    offset = f.seek(0, os.SEEK_END)
+                    f.write(frame)
+
+                self.records[content_hash] = (self.segment, offset, len(frame))
+                self.append_line(self.index_path, {
+                    "hash": content_hash, "segment": self.segment, "offset": offset,
+                    "length": len(frame), "size": len(body)
+                })
+
+            if self.urls.get(url) != (content_hash, charset):
+                self.urls[url] = (content_hash, charset)
+                self.append_line(self.urls_path, {
+                    "url": url, "hash": content_hash, "charset": charset,
+                    "time": datetime.now().isoformat()
+                })
+        return content_hash
+
+    def append_line(self, path: Path, record: Dict):
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def get(self, url: str) -> Optional[bytes]:
+        """按URL读取归档的原始内容"""
+        entry = self.urls.get(url)
+        if not entry:
+            return None
+        segment, offset, length = self.records[entry[0]]
+        return read_record(str(self.directory), segment, offset, length)
+
+    def iter_locations(self) -> Iterator[Tuple[str, Optional[str], int, int, int]]:
+        """遍历每个URL的(url, 编码, 分段, 偏移, 长度)"""
+        for url, (content_hash, charset) in self.urls.items():
+            segment, offset, length = self.records[content_hash]
+            yield url, charset, segment, offset, length
+
+
+_archive: Optional[HtmlArchive] = None
+
+
+def get_html_archive() -> HtmlArchive:
+    """获取进程内共享的归档实例"""
+    global _archive
+    if _archive is None:
+        _archive = HtmlArchive(settings.ARCHIVE_DIR)
+    return _archive
+
+
+def reextract_batch(directory: str, locations: List[Tuple[str, Optional[str], int, int, int]]) -> List[Tuple[str, str]]:
+    """在工作进程中重新抽取一批归档网页的正文，使用与爬虫相同的抽取方式"""
+    extract = extract_article_text_streaming if settings.ARTICLE_STREAMING else extract_article_text
+    results = []
+    for url, charset, segment, offset, length in locations:
+        try:
+            body = read_record(directory, segment, offset, length)
+            results.append((url, extract(body, charset)))
+        except Exception as e:
+            logger.error(f"重新抽取 {url} 失败: {e}")
+    return results
+
+
+async def reextract_archive(workers: int = 4, batch_size: int = 200) -> int:
+    """用当前抽取规则并行重新抽取归档中的全部网页，并就地更新 news_items 的正文"""
+    archive = get_html_archive()
+    locations = list(archive.iter_locations())
+    batches = [locations[i:i + batch_size] for i in range(0, len(locations), batch_size)]
+    logger.info(f"开始重新抽取 {len(locations)} 个归档网页，共 {len(batches)} 批")
+
+    loop = asyncio.get_running_loop()
+    updated = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            loop.run_in_executor(executor, reextract_batch, str(archive.directory), batch)
+            for batch in batches
+        ]
+        for future in asyncio.as_completed(futures):
+            results = await future
+            operations = [
+                UpdateOne({"url": url}, {"$set": {"content": content}})
+                for url, content in results if content
+            ]
+            if operations:
+                result = await db.db.news_items.bulk_write(operations, ordered=False)
+                updated += result.modified_count
+
+    logger.info(f"重新抽取完成，更新 {updated} 条新闻正文")
+    return updated
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+模型校验与序列化性能测试
+
+对比每1000条 NewsItem 和 AnalysisResult 的校验和序列化耗时：
+  legacy:   pydantic v1 风格模型（原实现，通过 pydantic.v1 兼容层运行），Model(**doc) / .dict() / .json()
+  v2:       原生 pydantic v2 模型，逐条 model_validate / model_dump / model_dump_json
+  adapter:  TypeAdapter 批量校验和序列化整个列表（列表接口当前的实现）
+
+用法: python benchmarks/bench_models.py [--count 1000] [--rounds 20]
+"""
+
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List, Optional
+
+from bson import ObjectId
+from pydantic import v1
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from models import AnalysisResult, AnalysisResultList, NewsItem, NewsItemList
+
+
+class LegacyObjectId(ObjectId):
+    """原实现的ObjectId类型"""
+
+    @classmethod
+    def __get_validators__(cls):
+        yield cls.validate
+
+    @classmethod
+    def validate(cls, v):
+        if not ObjectId.is_valid(v):
+            raise ValueError("Invalid objectid")
+        return ObjectId(v)
+
+
+class LegacyNewsItem(v1.BaseModel):
+    id: LegacyObjectId = v1.Field(default_factory=LegacyObjectId, alias="_id")
+    title: str
+    content: str
+    url: str
+    source_name: str
+    source_type: str
+    publish_time: datetime
+    crawl_time: datetime = v1.Field(default_factory=datetime.now)
+    is_processed: bool = False
+    simhash: Optional[int] = None
+    canonical_id: Optional[LegacyObjectId] = None
+    lease_owner: Optional[str] = None
+    lease_expires: Optional[datetime] = None
+
+    class Config:
+        allow_population_by_field_name = True
+        arbitrary_types_allowed = True
+        json_encoders = {ObjectId: str}
+
+
+class LegacyAnalysisResult(v1.BaseModel):
+    id: LegacyObjectId = v1.Field(default_factory=LegacyObjectId, alias="_id")
+    news_id: LegacyObjectId
+    sentiment_score: int
+    sentiment_desc: str
+    affected_sectors: List[str]
+    affected_concepts: List[str]
+    related_stocks: List[str]
+    time_range: str
+    importance: int
+    summary: str
+    analysis_time: datetime = v1.Field(default_factory=datetime.now)
+    reused_from: Optional[LegacyObjectId] = None
+
+    class Config:
+        allow_population_by_field_name = True
+        arbitrary_types_allowed = True
+        json_encoders = {ObjectId: str}
+
+
+def news_docs(count: int) -> List[dict]:
+    """模拟从MongoDB读出的新闻文档"""
+    now = datetime.now()
+    return [{
+        "_id": ObjectId(),
+        "title": f"央行宣布下调存款准备金率0.{i % 10}个百分点",
+        "content": "中国人民银行决定下调金融机构存款准备金率，释放长期资金约1万亿元。" * 20,
+        "url": f"https://finance.example.com/news/{i}.html",
+        "source_name": "新浪财经",
+        "source_type": "news",
+        "publish_time": now - timedelta(minutes=i),
+        "crawl_time": now,
+        "is_processed": bool(i % 2),
+        "simhash": -1234567890123 + i,
+        "canonical_id": ObjectId() if i % 5 == 0 else None,
+        "lease_owner": None,
+        "lease_expires": None,
+    } for i in range(count)]
+
+
+def analysis_docs(count: int) -> List[dict]:
+    """模拟从MongoDB读出的分析结果文档"""
+    now = datetime.now()
+    return [{
+        "_id": ObjectId(),
+        "news_id": ObjectId(),
+        "sentiment_score": i % 10 + 1,
+        "sentiment_desc": "利好",
+        "affected_sectors": ["银行", "房地产", "证券"],
+        "affected_concepts": ["降准", "流动性"],
+        "related_stocks": ["600036", "000001", "601318"],
+        "time_range": "短期",
+        "importance": i % 5 + 1,
+        "summary": "降准释放流动性，利好银行和地产板块。" * 3,
+        "analysis_time": now - timedelta(minutes=i),
+        "reused_from": None,
+    } for i in range(count)]
+
+
+def timeit(func, rounds: int) -> float:
+    """多轮运行取最快一轮的耗时（毫秒）"""
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def bench(name: str, docs: List[dict], legacy_model, model, adapter, rounds: int):
+    scale = 1000 / len(docs)
+    legacy_items = [legacy_model(**doc) for doc in docs]
+    items = adapter.validate_python(docs)
+
+    rows = [
+        ("校验", "legacy", lambda: [legacy_model(**doc) for doc in docs]),
+        ("校验", "v2", lambda: [model.model_validate(doc) for doc in docs]),
+        ("校验", "adapter", lambda: adapter.validate_python(docs)),
+        ("dump", "legacy", lambda: [item.dict(by_alias=True) for item in legacy_items]),
+        ("dump", "v2", lambda: [item.model_dump(by_alias=True) for item in items]),
+        ("dump", "adapter", lambda: adapter.dump_python(items, by_alias=True)),
+        ("JSON", "legacy", lambda: [item.json(by_alias=True) for item in legacy_items]),
+        ("JSON", "v2", lambda: [item.model_dump_json(by_alias=True) for item in items]),
+        ("JSON", "adapter", lambda: adapter.dump_json(items, by_alias=True)),
+    ]
+
+    print(f"{name}（每1000条耗时）")
+    baseline = {}
+    for operation, variant, func in rows:
+        elapsed = timeit(func, rounds) * scale
+        baseline.setdefault(operation, elapsed)
+        print(f"  {operation:<6}{variant:<10}{elapsed:>9.2f}ms   {baseline[operation] / elapsed:>6.2f}x")
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="模型校验与序列化性能测试")
+    parser.add_argument("--count", type=int, default=1000, help="每轮处理的文档数")
+    parser.add_argument("--rounds", type=int, default=20, help="重复轮数，取最快一轮")
+    args = parser.parse_args()
+
+    bench("NewsItem", news_docs(args.count), LegacyNewsItem, NewsItem, NewsItemList, args.rounds)
+    bench("AnalysisResult", analysis_docs(args.count), LegacyAnalysisResult, AnalysisResult,
+          AnalysisResultList, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
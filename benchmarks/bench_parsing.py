@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+正文解析性能测试
+
+对比两种方式解析 fixtures 目录中保存的网页：
+  baseline: 在事件循环内用 html.parser 解析（原实现）
+  pool:     用 lxml 在解析进程池中解析（当前实现）
+输出每秒处理页数以及事件循环的最大卡顿时间。
+
+用法: python benchmarks/bench_parsing.py [--pages 400] [--workers 4]
+"""
+
+import argparse
+import asyncio
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from extractor import CONTENT_SELECTORS, MAX_CONTENT_LENGTH, extract_article_text
+
+FIXTURE_DIR = Path(__file__).parent / "fixtures"
+
+
+def baseline_extract(body: bytes) -> str:
+    """原实现：html.parser + 同步解析"""
+    soup = BeautifulSoup(body.decode("utf-8"), 'html.parser')
+    for script in soup(["script", "style"]):
+        script.decompose()
+
+    content = ""
+    for selector in CONTENT_SELECTORS:
+        element = soup.select_one(selector)
+        if element:
+            content = element.get_text()
+            break
+
+    if not content:
+        paragraphs = soup.find_all('p')
+        content = '\n'.join([p.get_text() for p in paragraphs])
+
+    content = re.sub(r'\s+', ' ', content).strip()
+    return content[:MAX_CONTENT_LENGTH]
+
+
+async def monitor_loop_lag(stop: asyncio.Event, interval: float = 0.005) -> float:
+    """记录事件循环的最大卡顿时间"""
+    loop = asyncio.get_running_loop()
+    max_lag = 0.0
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(interval)
+        max_lag = max(max_lag, loop.time() - start - interval)
+    return max_lag
+
+
+async def run_baseline(pages):
+    async def parse(body):
+        await asyncio.sleep(0)
+        return baseline_extract(body)
+
+    return await asyncio.gather(*(parse(body) for body in pages))
+
+
+async def run_pool(pages, executor):
+    loop = asyncio.get_running_loop()
+    return await asyncio.gather(*(
+        loop.run_in_executor(executor, partial(extract_article_text, body, "utf-8"))
+        for body in pages
+    ))
+
+
+async def measure(name, runner, pages):
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(monitor_loop_lag(stop))
+    await asyncio.sleep(0.01)
+
+    start = time.perf_counter()
+    results = await runner(pages)
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    max_lag = await lag_task
+
+    chars = sum(len(r) for r in results)
+    print(f"{name:<10} {len(pages) / elapsed:>10.1f} 页/秒   "
+          f"总耗时 {elapsed:>6.2f}s   事件循环最大卡顿 {max_lag * 1000:>8.1f}ms   "
+          f"正文字符 {chars}")
+    return len(pages) / elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="正文解析性能测试")
+    parser.add_argument("--pages", type=int, default=400, help="解析页数")
+    parser.add_argument("--workers", type=int, default=4, help="解析进程数")
+    args = parser.parse_args()
+
+    fixtures = [path.read_bytes() for path in sorted(FIXTURE_DIR.glob("*.html"))]
+    if not fixtures:
+        print(f"未找到测试页面: {FIXTURE_DIR}")
+        return
+    pages = [fixtures[i % len(fixtures)] for i in range(args.pages)]
+    print(f"测试页面 {len(fixtures)} 个，共解析 {len(pages)} 页，解析进程 {args.workers} 个\n")
+
+    baseline = await measure("baseline", run_baseline, pages)
+
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        # 预热进程池，避免把进程启动时间计入结果
+        await run_pool(pages[:args.workers], executor)
+        pool = await measure("pool", partial(run_pool, executor=executor), pages)
+
+    print(f"\n提升: {pool / baseline:.2f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,6 +1,6 @@
 import os
-from typing import List
-from pydantic_settings import BaseSettings
+from typing import Dict, List
+from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
     # 数据库配置
@@ -22,6 +22,35 @@ class Settings(BaseSettings):
     USER_AGENT: str = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
     REQUEST_TIMEOUT: int = 30
     RETRY_TIMES: int = 3
+    CRAWL_CONCURRENCY: int = 20  # 全局并发抓取正文数
+    CRAWL_SOURCE_CONCURRENCY: int = 5  # 单个新闻源并发抓取正文数
+    KNOWN_URL_CACHE_SIZE: int = 50000  # 已入库URL的内存缓存容量
+    INGEST_BATCH_SIZE: int = 200  # 新闻批量入库每批的条数
+    PARSE_EXECUTOR: str = "process"  # HTML解析工作池类型: process/thread
+    PARSE_WORKERS: int = 4  # HTML解析工作池大小
+    CRAWL_CONNECTION_LIMIT: int = 100  # 爬虫连接池总连接数
+    CRAWL_CONNECTIONS_PER_HOST: int = 4  # 单个站点最大连接数
+    CRAWL_HOST_RATE: float = 2.0  # 单个站点每秒请求数（令牌桶速率）
+    CRAWL_HOST_BURST: int = 5  # 单个站点突发请求数（令牌桶容量）
+    CRAWL_DNS_CACHE_TTL: int = 300  # DNS缓存时间（秒）
+    RETRY_BACKOFF_BASE: float = 0.5  # 重试退避基数（秒）
+    RETRY_BACKOFF_MAX: float = 30.0  # 单次重试最长等待（秒）
+    ARTICLE_STREAMING: bool = True  # 边下载边提取正文，正文足够即停止下载
+    ARTICLE_MAX_BYTES: int = 1024 * 1024  # 单篇正文页面最多读取的字节数
+    
+    # 原始网页归档
+    # 只归档完整读取的网页：开启 ARTICLE_STREAMING 时提前结束下载的网页不归档，
+    # 需要完整归档时关闭流式提取，代价是每篇正文都下载整页（不超过 ARTICLE_MAX_BYTES）
+    ARCHIVE_ENABLED: bool = True
+    ARCHIVE_DIR: str = "html_archive"
+    ARCHIVE_SEGMENT_BYTES: int = 256 * 1024 * 1024  # 单个分段文件大小上限
+    ARCHIVE_COMPRESSION_LEVEL: int = 3
+    
+    # 自适应爬取调度
+    CRAWL_MIN_INTERVAL: int = 60  # 单个新闻源最短爬取间隔（秒）
+    CRAWL_MAX_INTERVAL: int = 3600  # 单个新闻源最长爬取间隔（秒）
+    CRAWL_BACKOFF_FACTOR: float = 1.5  # 无新内容时间隔放大倍数
+    CRAWL_SPEEDUP_FACTOR: float = 0.5  # 有新内容时间隔缩小倍数
     
     # 监控源配置
     NEWS_SOURCES: List[str] = [
@@ -39,7 +68,57 @@ class Settings(BaseSettings):
         "http://www.stats.gov.cn/"  # 统计局
     ]
     
+    # 近似重复新闻检测
+    DEDUP_WINDOW_HOURS: int = 72  # 只与该时间窗口内的新闻比较
+    DEDUP_MAX_DISTANCE: int = 3  # SimHash汉明距离不超过该值视为重复
+    DEDUP_INDEX_SIZE: int = 50000  # 内存索引最多保留的指纹数
+    DEDUP_MIN_LENGTH: int = 50  # 文本过短时不做指纹
+    
+    # 数据保留
+    RETENTION_DAYS: Dict[str, int] = {  # 各集合在线保留天数，超期后移入压缩归档
+        "news_items": 30,
+        "analysis_results": 90,
+        "alerts": 30,
+    }
+    RETENTION_TTL_GRACE_DAYS: int = 7  # TTL索引兜底删除时间 = 保留天数 + 宽限天数
+    RETENTION_ARCHIVE_DAYS: int = 365  # 压缩归档的保留天数
+    RETENTION_BATCH_SIZE: int = 500  # 每批归档的文档数
+    RETENTION_BATCH_PAUSE: float = 0.5  # 批次之间的间隔（秒），避免清理占满数据库IO
+    
+    # 事件驱动流水线
+    PIPELINE_EVENTS_ENABLED: bool = True  # 新闻入库立即唤醒分析，重要分析结果立即唤醒通知
+    PIPELINE_DEBOUNCE_SECONDS: float = 2.0  # 唤醒分析前等待同批新闻入库完成
+    ALERT_MIN_IMPORTANCE: int = 4  # 触发警报的最低重要性
+    
+    # 写后缓冲
+    WRITE_BUFFER_FLUSH_SECONDS: float = 2.0  # 状态更新最长缓冲时间
+    WRITE_BUFFER_MAX_PENDING: int = 1000  # 缓冲的更新达到该数量时立即写入
+    
+    # 统计
+    STATS_HISTORY_DAYS: int = 30  # /stats 返回的每日直方图天数
+    
+    # API分页
+    API_MAX_PAGE_SIZE: int = 200  # 列表接口单页最多返回的条数
+    
     # 分析配置
+    ANALYSIS_MODEL: str = os.getenv("ANALYSIS_MODEL", "gpt-3.5-turbo")  # 新闻分析和市场总结使用的模型
+    ANALYSIS_BATCH_SIZE: int = 50  # 每轮认领分析的新闻数
+    ANALYSIS_CONCURRENCY: int = 8  # 同时进行的LLM请求数
+    LLM_REQUESTS_PER_MINUTE: int = 500  # API配额：每分钟请求数
+    LLM_TOKENS_PER_MINUTE: int = 200000  # API配额：每分钟token数（提示词+输出）
+    LLM_BURST_SECONDS: int = 10  # 限速器允许的突发量，按几秒的配额计
+    LLM_MAX_RETRIES: int = 5  # 限流或服务端错误时的最大重试次数
+    LLM_BACKOFF_MAX: float = 60.0  # 限流后单次等待的上限（秒）
+    ANALYSIS_LEASE_SECONDS: int = 600  # 认领新闻后的租约时长，超时未完成可被其他工作进程重新认领
+    ANALYSIS_WORKER_IDLE_SECONDS: int = 30  # 分析工作进程没有待分析新闻时的等待时间
+    ANALYSIS_PROMPT_BATCHING: bool = True  # 把多条短新闻合并到一次请求中分析
+    ANALYSIS_PROMPT_BATCH_TOKENS: int = 4000  # 一次批量请求中新闻内容的token预算
+    ANALYSIS_PROMPT_BATCH_MAX_ARTICLES: int = 8  # 一次批量请求最多包含的新闻数
+    ANALYSIS_PROMPT_BATCH_OUTPUT_TOKENS: int = 400  # 批量请求中每条新闻预留的输出token数
+    LLM_CACHE_ENABLED: bool = True  # 按新闻内容缓存分析结果，内容相同的新闻不再调用API
+    LLM_CACHE_TTL_DAYS: int = 30  # 分析缓存条目的保留天数
+    LLM_CACHE_MAX_ENTRIES: int = 200000  # MongoDB中分析缓存的最大条目数，超出时由清理任务淘汰最久未用的
+    LLM_CACHE_MEMORY_SIZE: int = 5000  # 进程内LRU缓存的条目数
     ANALYSIS_PROMPT_TEMPLATE: str = """
     请分析以下财经新闻，并按照JSON格式返回分析结果：
     
@@ -65,7 +144,34 @@ class Settings(BaseSettings):
     }}
     """
     
-    class Config:
-        env_file = ".env"
+    ANALYSIS_BATCH_PROMPT_TEMPLATE: str = """
+    请分别分析以下{count}条财经新闻，每条新闻以【编号】开头：
+    
+    {articles}
+    
+    对每条新闻从以下方面进行分析：
+    1. 利好/利空程度（1-10分，1为极度利空，10为极度利好）
+    2. 影响的板块和概念（如新能源、半导体、医药等）
+    3. 可能影响的核心个股代码（A股6位数字代码）
+    4. 影响时间范围（短期/中期/长期）
+    5. 重要性评级（1-5星）
+    
+    返回JSON数组，每条新闻一个元素，id为新闻编号：
+    [
+        {{
+            "id": "1",
+            "sentiment_score": 6,
+            "sentiment_desc": "偏利好",
+            "affected_sectors": ["新能源", "电池"],
+            "affected_concepts": ["锂电池", "储能"],
+            "related_stocks": ["300750", "002466"],
+            "time_range": "中期",
+            "importance": 4,
+            "summary": "简要总结"
+        }}
+    ]
+    """
+    
+    model_config = SettingsConfigDict(env_file=".env")
 
 settings = Settings() 
\ No newline at end of file
@@ -1,38 +1,86 @@
 import asyncio
-import aiohttp
-import feedparser
-from bs4 import BeautifulSoup
-from datetime import datetime
-from typing import List, Optional
-from urllib.parse import urljoin, urlparse
+import hashlib
+import time
+from contextvars import ContextVar
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from functools import partial
+from typing import Dict, List, Optional
 import logging
-import re
 
 from config import settings
 from models import NewsItem, NewsSource
 from database import db
+from extractor import (
+    ArticleStreamExtractor, extract_article_text, parse_feed, parse_json_listing, parse_listing
+)
+from http_client import CrawlerHttpClient, FetchResult, get_host_stats
+from archive import get_html_archive
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class NewsCrawler:
+_parse_executor: Optional[Executor] = None
+
+# 常见时间格式，按顺序尝试
+TIME_FORMATS = [
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d %H:%M",
+    "%Y-%m-%d",
+    "%m-%d %H:%M",
+    "%Y年%m月%d日",
+    "%m月%d日"
+]
+
+# 各新闻源上次识别成功的时间格式
+detected_time_formats: Dict[str, str] = {}
+
+# 当前协程正在爬取的新闻源，用于归集性能数据
+current_source: ContextVar[str] = ContextVar("current_source", default="")
+
+def get_parse_executor() -> Executor:
+    """获取HTML解析工作池（首次使用时创建，进程内共享）"""
+    global _parse_executor
+    if _parse_executor is None:
+        if settings.PARSE_EXECUTOR == "thread":
+            _parse_executor = ThreadPoolExecutor(max_workers=settings.PARSE_WORKERS)
+        else:
+            _parse_executor = ProcessPoolExecutor(max_workers=settings.PARSE_WORKERS)
+    return _parse_executor
+
+class SourceMetrics:
+    """单个新闻源本次爬取的性能数据"""
+    
     def __init__(self):
-        self.session = None
+        self.items = 0
+        self.fetch_latencies: List[float] = []
+        self.parse_seconds = 0.0
+
+class NewsCrawler:
+    def __init__(self, dry_run: bool = False, recorder=None, replay_url: Optional[str] = None):
+        """dry_run为True时只抓取和解析，不读写数据库（用于录制和性能测试）"""
+        self.http = CrawlerHttpClient(recorder=recorder, replay_url=replay_url)
+        self.fetch_semaphore = None
+        self.dry_run = dry_run
+        self.metrics: Dict[str, SourceMetrics] = {}
         
     async def __aenter__(self):
-        self.session = aiohttp.ClientSession(
-            timeout=aiohttp.ClientTimeout(total=settings.REQUEST_TIMEOUT),
-            headers={"User-Agent": settings.USER_AGENT}
-        )
+        await self.http.start()
+        # 所有新闻源共享的正文抓取并发上限
+        self.fetch_semaphore = asyncio.Semaphore(settings.CRAWL_CONCURRENCY)
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if self.session:
-            await self.session.close()
+        await self.http.close()
+        for host, stats in get_host_stats().items():
+            logger.info(f"站点 {host} 请求统计: {stats}")
     
-    async def crawl_all_sources(self):
-        """爬取所有活跃的新闻源"""
+    async def crawl_all_sources(self, force: bool = False):
+        """爬取所有到期的活跃新闻源，force为True时忽略调度时间"""
         sources = await db.get_active_news_sources()
+        now = datetime.now()
+        if not force:
+            sources = [source for source in sources if self.is_due(source, now)]
         logger.info(f"开始爬取 {len(sources)} 个新闻源")
         
         tasks = []
@@ -48,371 +96,329 @@ class NewsCrawler:
             else:
                 total_news += result
         
+        # 新闻源的爬取状态经写后缓冲写入，本轮结束时立即写入，下一轮调度读取到的是最新状态
+        await db.flush_writes()
         logger.info(f"本次爬取完成，共获取 {total_news} 条新闻")
         return total_news
     
+    def is_due(self, source: NewsSource, now: datetime) -> bool:
+        """判断新闻源是否到了爬取时间"""
+        if source.next_crawl_time:
+            return source.next_crawl_time <= now
+        if source.last_crawled:
+            return source.last_crawled + timedelta(seconds=source.crawl_interval) <= now
+        return True
+    
+    def next_crawl_interval(self, source: NewsSource, news_count: int) -> int:
+        """根据本次新增数量调整爬取间隔：有新内容加快，无新内容退避"""
+        if news_count > 0:
+            interval = source.crawl_interval * settings.CRAWL_SPEEDUP_FACTOR
+        else:
+            interval = source.crawl_interval * settings.CRAWL_BACKOFF_FACTOR
+        return int(max(settings.CRAWL_MIN_INTERVAL, min(settings.CRAWL_MAX_INTERVAL, interval)))
+    
+    def source_metrics(self) -> SourceMetrics:
+        """当前正在爬取的新闻源的性能数据"""
+        name = current_source.get()
+        if name not in self.metrics:
+            self.metrics[name] = SourceMetrics()
+        return self.metrics[name]
+    
+    async def timed_fetch(self, url: str, **kwargs) -> FetchResult:
+        """请求URL并记录耗时"""
+        start = time.perf_counter()
+        result = await self.http.fetch(url, **kwargs)
+        self.source_metrics().fetch_latencies.append(time.perf_counter() - start)
+        return result
+    
     async def crawl_source(self, source: NewsSource) -> int:
         """爬取单个新闻源"""
+        current_source.set(source.name)
+        news_count = 0
         try:
-            if source.source_type == "sina_finance":
-                return await self.crawl_sina_finance()
-            elif source.source_type == "cnstock":
-                return await self.crawl_cnstock()
-            elif source.source_type == "csrc":
-                return await self.crawl_csrc()
-            elif source.source_type == "sse":
-                return await self.crawl_sse()
-            elif source.source_type == "szse":
-                return await self.crawl_szse()
-            elif source.source_type == "stats":
-                return await self.crawl_stats()
+            if source.listing_format == "rss":
+                news_count = await self.crawl_generic_rss(source)
             else:
-                return await self.crawl_generic_rss(source)
+                news_count = await self.crawl_listing(source)
+            self.source_metrics().items += news_count
+            
+            if self.dry_run:
+                return news_count
+            
+            # 本次内容处理完成后才保存校验信息，失败时下次仍会完整爬取
+            await db.update_news_source_validators(
+                str(source.id), source.etag, source.last_modified, source.content_hash
+            )
+            return news_count
         except Exception as e:
             logger.error(f"爬取 {source.name} 时出错: {e}")
             return 0
         finally:
-            await db.update_news_source_crawl_time(str(source.id))
+            if not self.dry_run:
+                interval = self.next_crawl_interval(source, news_count)
+                await db.update_news_source_crawl_time(
+                    str(source.id),
+                    crawl_interval=interval,
+                    next_crawl_time=datetime.now() + timedelta(seconds=interval)
+                )
+                logger.info(f"{source.name} 新增 {news_count} 条，下次爬取间隔 {interval} 秒")
     
-    async def crawl_sina_finance(self) -> int:
-        """爬取新浪财经"""
-        url = "https://feed.sina.com.cn/api/roll/get?pageid=153&lid=2516&k=&num=50&page=1"
+    async def fetch_listing(self, source: NewsSource, url: str) -> Optional[FetchResult]:
+        """条件请求列表页，未修改（304或内容哈希相同）时返回None"""
+        headers = {}
+        if source.etag:
+            headers["If-None-Match"] = source.etag
+        if source.last_modified:
+            headers["If-Modified-Since"] = source.last_modified
         
-        async with self.session.get(url) as response:
-            data = await response.json()
-            
-        news_count = 0
-        if data.get("result") and data["result"].get("data"):
-            for item in data["result"]["data"]:
-                try:
-                    news_item = NewsItem(
-                        title=item.get("title", ""),
-                        content=await self.get_page_content(item.get("url", "")),
-                        url=item.get("url", ""),
-                        source_name="新浪财经",
-                        source_type="news",
-                        publish_time=datetime.fromtimestamp(int(item.get("ctime", 0)))
-                    )
-                    await db.create_news_item(news_item)
-                    news_count += 1
-                except Exception as e:
-                    logger.error(f"处理新浪财经新闻时出错: {e}")
-        
-        return news_count
-    
-    async def crawl_cnstock(self) -> int:
-        """爬取中国证券网"""
-        url = "http://www.cnstock.com/v_news/sns_yw/index.html"
+        result = await self.timed_fetch(url, headers=headers)
+        if result.status == 304:
+            logger.info(f"{source.name} 列表页未修改 (304)")
+            return None
         
-        async with self.session.get(url) as response:
-            text = await response.text()
+        content_hash = hashlib.sha1(result.body).hexdigest()
+        if content_hash == source.content_hash:
+            logger.info(f"{source.name} 列表页内容未变化")
+            return None
         
-        soup = BeautifulSoup(text, 'html.parser')
-        news_items = soup.find_all('div', class_='news_item')
-        
-        news_count = 0
-        for item in news_items:
-            try:
-                title_elem = item.find('a')
-                if title_elem:
-                    title = title_elem.get_text().strip()
-                    url = urljoin("http://www.cnstock.com", title_elem.get('href'))
-                    
-                    time_elem = item.find('span', class_='time')
-                    pub_time = datetime.now()
-                    if time_elem:
-                        time_str = time_elem.get_text().strip()
-                        pub_time = self.parse_time(time_str)
-                    
-                    content = await self.get_page_content(url)
-                    
-                    news_item = NewsItem(
-                        title=title,
-                        content=content,
-                        url=url,
-                        source_name="中国证券网",
-                        source_type="news",
-                        publish_time=pub_time
-                    )
-                    await db.create_news_item(news_item)
-                    news_count += 1
-            except Exception as e:
-                logger.error(f"处理中国证券网新闻时出错: {e}")
-        
-        return news_count
+        source.etag = result.headers.get("ETag")
+        source.last_modified = result.headers.get("Last-Modified")
+        source.content_hash = content_hash
+        return result
     
-    async def crawl_csrc(self) -> int:
-        """爬取证监会公告"""
-        url = "http://www.csrc.gov.cn/newsite/zjhxwfb/"
-        
-        async with self.session.get(url) as response:
-            text = await response.text()
+    async def crawl_listing(self, source: NewsSource) -> int:
+        """按新闻源定义的抽取规则爬取列表页（html或json）"""
+        listing_url = source.listing_url or source.url
+        result = await self.fetch_listing(source, listing_url)
+        if result is None:
+            return 0
         
-        soup = BeautifulSoup(text, 'html.parser')
-        news_items = soup.find_all('li', class_='news_item')
+        if source.listing_format == "json":
+            rows = await self.run_parser(
+                parse_json_listing, result.body, listing_url, source.json_items_path, source.json_fields
+            )
+        else:
+            rows = await self.run_parser(
+                parse_listing, result.body, result.charset, listing_url,
+                source.item_selector, source.link_selector, source.time_selector
+            )
         
-        news_count = 0
-        for item in news_items:
+        entries = []
+        for row in rows:
             try:
-                link_elem = item.find('a')
-                if link_elem:
-                    title = link_elem.get_text().strip()
-                    url = urljoin("http://www.csrc.gov.cn", link_elem.get('href'))
-                    
-                    time_elem = item.find('span', class_='date')
-                    pub_time = datetime.now()
-                    if time_elem:
-                        time_str = time_elem.get_text().strip()
-                        pub_time = self.parse_time(time_str)
-                    
-                    content = await self.get_page_content(url)
-                    
-                    news_item = NewsItem(
-                        title=title,
-                        content=content,
-                        url=url,
-                        source_name="中国证监会",
-                        source_type="official",
-                        publish_time=pub_time
-                    )
-                    await db.create_news_item(news_item)
-                    news_count += 1
+                pub_time = self.parse_time(row["time"], source) if row["time"] else datetime.now()
+                entries.append({"title": row["title"], "url": row["url"], "publish_time": pub_time})
             except Exception as e:
-                logger.error(f"处理证监会公告时出错: {e}")
+                logger.error(f"处理{source.name}条目时出错: {e}")
         
-        return news_count
+        return await self.fetch_items(entries, source.name, source.source_type, f"{source.name}条目")
     
-    async def crawl_sse(self) -> int:
-        """爬取上交所公告"""
-        url = "http://www.sse.com.cn/news/newslist/"
-        
-        async with self.session.get(url) as response:
-            text = await response.text()
-        
-        soup = BeautifulSoup(text, 'html.parser')
-        news_items = soup.find_all('div', class_='news-item')
-        
-        news_count = 0
-        for item in news_items:
-            try:
-                link_elem = item.find('a')
-                if link_elem:
-                    title = link_elem.get_text().strip()
-                    url = urljoin("http://www.sse.com.cn", link_elem.get('href'))
-                    
-                    time_elem = item.find('span', class_='time')
-                    pub_time = datetime.now()
-                    if time_elem:
-                        time_str = time_elem.get_text().strip()
-                        pub_time = self.parse_time(time_str)
-                    
-                    content = await self.get_page_content(url)
-                    
-                    news_item = NewsItem(
-                        title=title,
-                        content=content,
-                        url=url,
-                        source_name="上海证券交易所",
-                        source_type="official",
-                        publish_time=pub_time
-                    )
-                    await db.create_news_item(news_item)
-                    news_count += 1
-            except Exception as e:
-                logger.error(f"处理上交所公告时出错: {e}")
-        
-        return news_count
+    async def run_parser(self, func, *args):
+        """在解析进程池中执行解析函数，避免阻塞事件循环"""
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            return await loop.run_in_executor(get_parse_executor(), partial(func, *args))
+        finally:
+            self.source_metrics().parse_seconds += time.perf_counter() - start
     
-    async def crawl_szse(self) -> int:
-        """爬取深交所公告"""
-        url = "http://www.szse.cn/news/index.html"
-        
-        async with self.session.get(url) as response:
-            text = await response.text()
+    async def fetch_items(self, entries: List[Dict], source_name: str, source_type: str, label: str) -> int:
+        """并发抓取列表条目的正文并保存，单条失败不影响其他条目"""
+        # 已入库的URL直接跳过，不再下载正文
+        urls = [entry["url"] for entry in entries if entry["url"]]
+        new_urls = set(urls if self.dry_run else await db.filter_new_urls(urls))
+        pending = {}
+        for entry in entries:
+            if entry["url"] in new_urls and entry["url"] not in pending:
+                pending[entry["url"]] = entry
+        if not pending:
+            return 0
         
-        soup = BeautifulSoup(text, 'html.parser')
-        news_items = soup.find_all('tr')
+        source_semaphore = asyncio.Semaphore(settings.CRAWL_SOURCE_CONCURRENCY)
         
-        news_count = 0
-        for item in news_items:
+        async def fetch_one(entry: Dict) -> Optional[NewsItem]:
             try:
-                link_elem = item.find('a')
-                if link_elem:
-                    title = link_elem.get_text().strip()
-                    url = urljoin("http://www.szse.cn", link_elem.get('href'))
-                    
-                    tds = item.find_all('td')
-                    pub_time = datetime.now()
-                    if len(tds) > 1:
-                        time_str = tds[-1].get_text().strip()
-                        pub_time = self.parse_time(time_str)
-                    
-                    content = await self.get_page_content(url)
-                    
-                    news_item = NewsItem(
-                        title=title,
-                        content=content,
-                        url=url,
-                        source_name="深圳证券交易所",
-                        source_type="official",
-                        publish_time=pub_time
-                    )
-                    await db.create_news_item(news_item)
-                    news_count += 1
+                async with source_semaphore:
+                    content = await self.get_page_content(entry["url"])
+                
+                return NewsItem(
+                    title=entry["title"],
+                    content=content,
+                    url=entry["url"],
+                    source_name=source_name,
+                    source_type=source_type,
+                    publish_time=entry["publish_time"]
+                )
             except Exception as e:
-                logger.error(f"处理深交所公告时出错: {e}")
+                logger.error(f"处理{label}时出错: {e}")
+                return None
         
-        return news_count
+        results = await asyncio.gather(*(fetch_one(entry) for entry in pending.values()))
+        return await self.save_items([item for item in results if item is not None], label)
     
-    async def crawl_stats(self) -> int:
-        """爬取统计局公告"""
-        url = "http://www.stats.gov.cn/tjsj/"
-        
-        async with self.session.get(url) as response:
-            text = await response.text()
+    async def save_items(self, items: List[NewsItem], label: str) -> int:
+        """批量入库新闻，返回新增数量"""
+        if self.dry_run or not items:
+            return len(items)
+        inserted, duplicates = await db.upsert_news_items(items)
+        if duplicates:
+            logger.info(f"{label}: 新增 {inserted} 条，跳过重复 {duplicates} 条")
+        return inserted
+    
+    async def crawl_generic_rss(self, source: NewsSource) -> int:
+        """爬取通用RSS/Atom源"""
+        result = await self.fetch_listing(source, source.url)
+        if result is None:
+            return 0
         
-        soup = BeautifulSoup(text, 'html.parser')
-        news_items = soup.find_all('li')
+        entries = await self.run_parser(parse_feed, result.body)
         
-        news_count = 0
-        for item in news_items:
+        items = []
+        for entry in entries:
             try:
-                link_elem = item.find('a')
-                if link_elem and 'href' in link_elem.attrs:
-                    title = link_elem.get_text().strip()
-                    url = urljoin("http://www.stats.gov.cn", link_elem.get('href'))
-                    
-                    time_elem = item.find('span')
-                    pub_time = datetime.now()
-                    if time_elem:
-                        time_str = time_elem.get_text().strip()
-                        pub_time = self.parse_time(time_str)
-                    
-                    content = await self.get_page_content(url)
-                    
-                    news_item = NewsItem(
-                        title=title,
-                        content=content,
-                        url=url,
-                        source_name="国家统计局",
-                        source_type="official",
-                        publish_time=pub_time
-                    )
-                    await db.create_news_item(news_item)
-                    news_count += 1
+                items.append(NewsItem(
+                    title=entry["title"],
+                    content=entry["content"],
+                    url=entry["url"],
+                    source_name=source.name,
+                    source_type=source.source_type,
+                    publish_time=entry["publish_time"] or datetime.now()
+                ))
             except Exception as e:
-                logger.error(f"处理统计局公告时出错: {e}")
+                logger.error(f"处理RSS条目时出错: {e}")
         
-        return news_count
-    
-    async def crawl_generic_rss(self, source: NewsSource) -> int:
-        """爬取通用RSS源"""
-        try:
-            feed = feedparser.parse(source.url)
-            news_count = 0
-            
-            for entry in feed.entries:
-                try:
-                    content = entry.get('description', '')
-                    if hasattr(entry, 'content'):
-                        content = entry.content[0].value
-                    
-                    pub_time = datetime.now()
-                    if hasattr(entry, 'published_parsed'):
-                        pub_time = datetime(*entry.published_parsed[:6])
-                    
-                    news_item = NewsItem(
-                        title=entry.title,
-                        content=content,
-                        url=entry.link,
-                        source_name=source.name,
-                        source_type=source.source_type,
-                        publish_time=pub_time
-                    )
-                    await db.create_news_item(news_item)
-                    news_count += 1
-                except Exception as e:
-                    logger.error(f"处理RSS条目时出错: {e}")
-            
-            return news_count
-        except Exception as e:
-            logger.error(f"爬取RSS源 {source.url} 时出错: {e}")
-            return 0
+        return await self.save_items(items, f"{source.name}RSS条目")
     
     async def get_page_content(self, url: str) -> str:
         """获取网页正文内容"""
         try:
-            async with self.session.get(url) as response:
-                text = await response.text()
-            
-            soup = BeautifulSoup(text, 'html.parser')
-            
-            # 移除脚本和样式
-            for script in soup(["script", "style"]):
-                script.decompose()
-            
-            # 尝试找到正文内容
-            content_selectors = [
-                'div.content', 'div.article-content', 'div.news-content',
-                'div.main-content', 'article', '.article-body', '.content-body'
-            ]
-            
-            content = ""
-            for selector in content_selectors:
-                element = soup.select_one(selector)
-                if element:
-                    content = element.get_text()
-                    break
+            async with self.fetch_semaphore:
+                if settings.ARTICLE_STREAMING:
+                    return await self.stream_page_content(url)
+                result = await self.timed_fetch(url, max_bytes=settings.ARTICLE_MAX_BYTES)
             
-            if not content:
-                # 如果没找到特定选择器，获取所有p标签内容
-                paragraphs = soup.find_all('p')
-                content = '\n'.join([p.get_text() for p in paragraphs])
-            
-            # 清理文本
-            content = re.sub(r'\s+', ' ', content).strip()
-            return content[:5000]  # 限制长度
+            await self.archive_page(result)
+            return await self.run_parser(extract_article_text, result.body, result.charset)
             
         except Exception as e:
             logger.error(f"获取页面内容失败 {url}: {e}")
             return ""
     
-    def parse_time(self, time_str: str) -> datetime:
-        """解析时间字符串"""
+    async def stream_page_content(self, url: str) -> str:
+        """边下载边提取正文，正文足够或达到字节上限即停止下载"""
+        loop = asyncio.get_running_loop()
+        metrics = self.source_metrics()
+        extractor = None
+        parse_seconds = 0.0
+        
+        async def on_chunk(chunk: bytes, charset: Optional[str]) -> bool:
+            nonlocal extractor, parse_seconds
+            if extractor is None:
+                extractor = ArticleStreamExtractor(charset)
+            # lxml增量解析在线程中执行，不阻塞事件循环
+            parse_start = time.perf_counter()
+            done = await loop.run_in_executor(None, extractor.feed, chunk)
+            parse_seconds += time.perf_counter() - parse_start
+            return done
+        
+        start = time.perf_counter()
+        result = await self.http.fetch(url, max_bytes=settings.ARTICLE_MAX_BYTES, on_chunk=on_chunk)
+        metrics.fetch_latencies.append(time.perf_counter() - start - parse_seconds)
+        await self.archive_page(result)
+        if extractor is None:
+            return ""
+        
+        parse_start = time.perf_counter()
+        content = await loop.run_in_executor(None, extractor.close)
+        metrics.parse_seconds += parse_seconds + time.perf_counter() - parse_start
+        return content
+    
+    async def archive_page(self, result: FetchResult):
+        """把原始网页写入压缩归档，供抽取规则变化后重新抽取"""
+        if self.dry_run or not settings.ARCHIVE_ENABLED or not result.body:
+            return
+        if result.truncated:
+            # 提前结束下载或超过字节上限的不完整网页，重新抽取可能得到更差的正文，不归档
+            logger.debug(f"网页未完整读取，跳过归档: {result.url}")
+            return
+        try:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, get_html_archive().put, result.url, result.body, result.charset)
+        except Exception as e:
+            logger.error(f"归档网页失败 {result.url}: {e}")
+    
+    def parse_time(self, time_str: str, source: Optional[NewsSource] = None) -> datetime:
+        """解析时间字符串，优先使用新闻源声明的格式和上次识别成功的格式"""
         try:
-            # 处理各种时间格式
-            formats = [
-                "%Y-%m-%d %H:%M:%S",
-                "%Y-%m-%d %H:%M",
-                "%Y-%m-%d",
-                "%m-%d %H:%M",
-                "%Y年%m月%d日",
-                "%m月%d日"
-            ]
+            time_format = source.time_format if source else None
+            if time_format == "timestamp":
+                return datetime.fromtimestamp(int(float(time_str)))
             
-            for fmt in formats:
+            cache_key = source.url if source else None
+            candidates = [time_format, detected_time_formats.get(cache_key)] + TIME_FORMATS
+            
+            for fmt in candidates:
+                if not fmt:
+                    continue
                 try:
-                    return datetime.strptime(time_str, fmt)
+                    parsed = datetime.strptime(time_str, fmt)
                 except ValueError:
                     continue
+                if cache_key:
+                    detected_time_formats[cache_key] = fmt
+                # 不含年份的格式默认为今年，跨年时（如1月初看到12月底的新闻）落在未来的算作去年
+                if "%Y" not in fmt:
+                    now = datetime.now()
+                    parsed = parsed.replace(year=now.year)
+                    if parsed > now + timedelta(days=1):
+                        parsed = parsed.replace(year=now.year - 1)
+                return parsed
             
             # 如果都解析失败，返回当前时间
             return datetime.now()
-        except:
+        except Exception:
             return datetime.now()
 
+# 内置新闻源定义，新增同类站点只需增加一条定义
+DEFAULT_SOURCES = [
+    NewsSource(
+        name="新浪财经", url="https://finance.sina.com.cn/", source_type="news", crawl_interval=60,
+        listing_format="json",
+        listing_url="https://feed.sina.com.cn/api/roll/get?pageid=153&lid=2516&k=&num=50&page=1",
+        json_items_path="result.data", json_fields={"title": "title", "url": "url", "time": "ctime"},
+        time_format="timestamp"
+    ),
+    NewsSource(
+        name="中国证券网", url="http://www.cnstock.com/", source_type="news", crawl_interval=300,
+        listing_format="html", listing_url="http://www.cnstock.com/v_news/sns_yw/index.html",
+        item_selector="div.news_item", time_selector="span.time"
+    ),
+    NewsSource(
+        name="中国证监会", url="http://www.csrc.gov.cn/", source_type="official", crawl_interval=300,
+        listing_format="html", listing_url="http://www.csrc.gov.cn/newsite/zjhxwfb/",
+        item_selector="li.news_item", time_selector="span.date"
+    ),
+    NewsSource(
+        name="上海证券交易所", url="http://www.sse.com.cn/", source_type="official", crawl_interval=300,
+        listing_format="html", listing_url="http://www.sse.com.cn/news/newslist/",
+        item_selector="div.news-item", time_selector="span.time"
+    ),
+    NewsSource(
+        # 时间位于行内最后一个单元格（至少两列时）
+        name="深圳证券交易所", url="http://www.szse.cn/", source_type="official", crawl_interval=300,
+        listing_format="html", listing_url="http://www.szse.cn/news/index.html",
+        item_selector="tr", time_selector="td:last-child:not(:first-child)"
+    ),
+    NewsSource(
+        name="国家统计局", url="http://www.stats.gov.cn/", source_type="official", crawl_interval=3600,
+        listing_format="html", listing_url="http://www.stats.gov.cn/tjsj/",
+        item_selector="li", time_selector="span"
+    ),
+]
+
 # 初始化数据源
 async def init_news_sources():
     """初始化新闻源"""
-    sources = [
-        NewsSource(name="新浪财经", url="https://finance.sina.com.cn/", source_type="sina_finance"),
-        NewsSource(name="中国证券网", url="http://www.cnstock.com/", source_type="cnstock"),
-        NewsSource(name="中国证监会", url="http://www.csrc.gov.cn/", source_type="csrc"),
-        NewsSource(name="上海证券交易所", url="http://www.sse.com.cn/", source_type="sse"),
-        NewsSource(name="深圳证券交易所", url="http://www.szse.cn/", source_type="szse"),
-        NewsSource(name="国家统计局", url="http://www.stats.gov.cn/", source_type="stats"),
-    ]
-    
-    for source in sources:
-        await db.create_news_source(source)
-        logger.info(f"初始化新闻源: {source.name}") 
\ No newline at end of file
+    for source in DEFAULT_SOURCES:
+        await db.upsert_news_source(source)
+        logger.info(f"初始化新闻源: {source.name}")
@@ -1,136 +1,709 @@
 import motor.motor_asyncio
-from typing import List, Optional
+import asyncio
+import base64
+import binascii
+import json
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ReturnDocument, UpdateMany, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
 from config import settings
-from models import NewsSource, NewsItem, AnalysisResult, StockInfo, Subscriber, Alert
+from dedup import simhash, simhash_index, to_signed, to_unsigned
+from models import (
+    NewsSource, NewsItem, AnalysisResult, StockInfo, Subscriber, Alert,
+    NewsSourceList, NewsItemList, AnalysisResultList, StockInfoList, SubscriberList
+)
+
+logger = logging.getLogger(__name__)
+
+# MongoDB唯一索引冲突的错误码
+DUPLICATE_KEY_ERROR = 11000
+
+# 重建统计计数时使用的临时集合，写完后改名替换 stats
+STATS_STAGING_COLLECTION = "stats_rebuild"
+
+# 列表视图返回的字段，不包含正文等大字段
+NEWS_LIST_PROJECTION = {
+    field: 1 for field in
+    ["title", "url", "source_name", "source_type", "publish_time", "crawl_time", "is_processed", "canonical_id"]
+}
+ANALYSIS_LIST_PROJECTION = {
+    field: 1 for field in
+    ["news_id", "sentiment_score", "sentiment_desc", "affected_sectors", "related_stocks",
+     "time_range", "importance", "summary", "analysis_time", "reused_from"]
+}
+
+def encode_page_token(doc: Dict, sort_field: Optional[str] = None) -> str:
+    """把一页最后一条文档的排序键编码为不透明的续页令牌"""
+    key = {"id": str(doc["_id"])}
+    if sort_field:
+        key["t"] = doc[sort_field].isoformat()
+    return base64.urlsafe_b64encode(json.dumps(key).encode("utf-8")).decode("ascii").rstrip("=")
+
+def keyset_filter(token: str, sort_field: Optional[str] = None, descending: bool = True) -> Dict:
+    """
+    把续页令牌转换为查询条件，取排序键 (sort_field, _id) 严格位于令牌之后的文档。
+    
+    令牌无效时抛出 ValueError。
+    """
+    try:
+        key = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        last_id = ObjectId(key["id"])
+        last_value = datetime.fromisoformat(key["t"]) if sort_field else None
+    except (ValueError, KeyError, TypeError, binascii.Error, InvalidId) as e:
+        raise ValueError("无效的分页令牌") from e
+    
+    op = "$lt" if descending else "$gt"
+    if not sort_field:
+        return {"_id": {op: last_id}}
+    return {"$or": [
+        {sort_field: {op: last_value}},
+        {sort_field: last_value, "_id": {op: last_id}}
+    ]}
+
+def with_page(query: Dict, after: Optional[str], sort_field: Optional[str] = None, descending: bool = True) -> Dict:
+    """在查询条件上叠加续页条件"""
+    if not after:
+        return query
+    return {"$and": [query, keyset_filter(after, sort_field, descending)]}
+
+class WriteBuffer:
+    """
+    状态更新的写后缓冲。
+    
+    新闻处理完成、警报已发送、新闻源爬取状态、统计计数这几类更新先在内存中合并，
+    每隔 WRITE_BUFFER_FLUSH_SECONDS 或累计 WRITE_BUFFER_MAX_PENDING 条后用 bulk_write 批量写入，
+    关闭数据库时写入剩余部分。同一新闻源的多次更新只保留各字段的最新值，
+    同一警报的多个接收者合并为一次 $addToSet，统计计数合并为一次 $inc。
+    """
+    
+    def __init__(self, database):
+        self.db = database
+        self.completed_news: Dict[str, set] = {}  # 租约持有者 -> 新闻ID
+        self.alert_recipients: Dict[ObjectId, set] = {}
+        self.source_updates: Dict[ObjectId, Dict] = {}
+        self.stat_increments: Dict[str, int] = {}  # totals 计数字段 -> 增量
+        self.pending = 0
+        self.flush_task = None
+        self.flush_lock = asyncio.Lock()
+    
+    async def add(self):
+        """记录一条待写入的更新，必要时启动定时写入或立即写入"""
+        self.pending += 1
+        if self.flush_task is None or self.flush_task.done():
+            self.flush_task = asyncio.get_running_loop().create_task(self.run())
+        if self.pending >= settings.WRITE_BUFFER_MAX_PENDING:
+            await self.flush()
+    
+    async def run(self):
+        while True:
+            await asyncio.sleep(settings.WRITE_BUFFER_FLUSH_SECONDS)
+            await self.flush()
+    
+    async def flush(self):
+        """把已合并的更新批量写入数据库，写入失败的更新放回缓冲等待下次重试"""
+        async with self.flush_lock:
+            if not self.pending:
+                return
+            completed_news, self.completed_news = self.completed_news, {}
+            alert_recipients, self.alert_recipients = self.alert_recipients, {}
+            source_updates, self.source_updates = self.source_updates, {}
+            stat_increments, self.stat_increments = self.stat_increments, {}
+            self.pending = 0
+            
+            await self.write_completed_news(completed_news)
+            await self.write_alert_recipients(alert_recipients)
+            await self.write_source_updates(source_updates)
+            await self.write_stat_increments(stat_increments)
+    
+    async def write_completed_news(self, completed_news: Dict[str, set]):
+        if not completed_news:
+            return
+        operations = [
+            UpdateMany(
+                {"_id": {"$in": list(news_ids)}, "lease_owner": owner},
+                {"$set": {"is_processed": True}, "$unset": {"lease_owner": "", "lease_expires": ""}}
+            )
+            for owner, news_ids in completed_news.items()
+        ]
+        try:
+            result = await self.db.news_items.bulk_write(operations, ordered=False)
+            expected = sum(len(news_ids) for news_ids in completed_news.values())
+            if result.matched_count < expected:
+                logger.warning(f"{expected - result.matched_count} 条新闻的租约已过期并被其他工作进程接管")
+        except Exception as e:
+            logger.error(f"批量标记新闻已处理失败: {e}")
+            for owner, news_ids in completed_news.items():
+                self.completed_news.setdefault(owner, set()).update(news_ids)
+            self.pending += len(operations)
+    
+    async def write_alert_recipients(self, alert_recipients: Dict[ObjectId, set]):
+        if not alert_recipients:
+            return
+        operations = [
+            UpdateOne({"_id": alert_id}, {"$addToSet": {"sent_to": {"$each": sorted(recipients)}}})
+            for alert_id, recipients in alert_recipients.items()
+        ]
+        try:
+            await self.db.alerts.bulk_write(operations, ordered=False)
+        except Exception as e:
+            logger.error(f"批量记录警报发送状态失败: {e}")
+            for alert_id, recipients in alert_recipients.items():
+                self.alert_recipients.setdefault(alert_id, set()).update(recipients)
+            self.pending += len(operations)
+    
+    async def write_source_updates(self, source_updates: Dict[ObjectId, Dict]):
+        if not source_updates:
+            return
+        operations = [
+            UpdateOne({"_id": source_id}, {"$set": updates})
+            for source_id, updates in source_updates.items()
+        ]
+        try:
+            await self.db.news_sources.bulk_write(operations, ordered=False)
+        except Exception as e:
+            logger.error(f"批量更新新闻源状态失败: {e}")
+            for source_id, updates in source_updates.items():
+                # 失败期间又有新的更新时，以新值为准
+                self.source_updates[source_id] = {**updates, **self.source_updates.get(source_id, {})}
+            self.pending += len(operations)
+    
+    async def write_stat_increments(self, stat_increments: Dict[str, int]):
+        if not stat_increments:
+            return
+        try:
+            await self.db.stats.update_one({"_id": "totals"}, {"$inc": stat_increments}, upsert=True)
+        except Exception as e:
+            logger.error(f"批量更新统计计数失败: {e}")
+            for field, amount in stat_increments.items():
+                self.stat_increments[field] = self.stat_increments.get(field, 0) + amount
+            self.pending += 1
+    
+    async def close(self):
+        # 持有写入锁时定时任务只可能在等待，不会在写入中途被取消而丢失已取出的更新
+        async with self.flush_lock:
+            if self.flush_task and not self.flush_task.done():
+                self.flush_task.cancel()
+        await self.flush()
 
 class Database:
     def __init__(self):
         self.client = motor.motor_asyncio.AsyncIOMotorClient(settings.MONGODB_URL)
         self.db = self.client[settings.DATABASE_NAME]
+        # 已入库新闻URL的进程内LRU缓存，避免重复抓取正文
+        self.known_urls = OrderedDict()
+        self.known_urls_warmed = False
+        self.url_index_ready = False
+        # 状态更新的写后缓冲
+        self.write_buffer = WriteBuffer(self.db)
+        # 进程内事件订阅，变更流不可用时由写入路径直接通知
+        self.event_queues: Dict[str, List[asyncio.Queue]] = {}
+        
+    def subscribe_events(self, event: str) -> asyncio.Queue:
+        """订阅进程内写入事件（news_inserted / analysis_created）"""
+        queue = asyncio.Queue()
+        self.event_queues.setdefault(event, []).append(queue)
+        return queue
+    
+    def publish_event(self, event: str, payload):
+        for queue in self.event_queues.get(event, []):
+            queue.put_nowait(payload)
+    
+    async def flush_writes(self):
+        """立即写入缓冲中的状态更新"""
+        await self.write_buffer.flush()
         
     async def close(self):
+        await self.write_buffer.close()
         self.client.close()
     
     # News Sources
     async def create_news_source(self, source: NewsSource) -> str:
-        result = await self.db.news_sources.insert_one(source.dict(by_alias=True, exclude={"id"}))
+        result = await self.db.news_sources.insert_one(source.model_dump(by_alias=True, exclude={"id"}))
         return str(result.inserted_id)
     
+    async def upsert_news_source(self, source: NewsSource) -> str:
+        """按url保存新闻源定义，保留已有的爬取状态"""
+        doc = source.model_dump(by_alias=True, exclude={"id"})
+        state_fields = [
+            "is_active", "last_crawled", "crawl_interval", "next_crawl_time",
+            "etag", "last_modified", "content_hash"
+        ]
+        state = {field: doc.pop(field) for field in state_fields}
+        
+        result = await self.db.news_sources.find_one_and_update(
+            {"url": source.url},
+            {"$set": doc, "$setOnInsert": state},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return str(result["_id"])
+    
     async def get_active_news_sources(self) -> List[NewsSource]:
         cursor = self.db.news_sources.find({"is_active": True})
-        sources = []
-        async for doc in cursor:
-            sources.append(NewsSource(**doc))
-        return sources
+        return NewsSourceList.validate_python(await cursor.to_list(length=None))
+    
+    async def update_news_source_crawl_time(self, source_id: str, crawl_interval: Optional[int] = None,
+                                            next_crawl_time: Optional[datetime] = None):
+        updates = {"last_crawled": datetime.now()}
+        if crawl_interval is not None:
+            updates["crawl_interval"] = crawl_interval
+        if next_crawl_time is not None:
+            updates["next_crawl_time"] = next_crawl_time
+        await self.buffer_source_update(source_id, updates)
     
-    async def update_news_source_crawl_time(self, source_id: str):
-        await self.db.news_sources.update_one(
-            {"_id": source_id},
-            {"$set": {"last_crawled": datetime.now()}}
+    async def update_news_source_validators(self, source_id: str, etag: Optional[str],
+                                            last_modified: Optional[str], content_hash: Optional[str]):
+        """保存新闻源列表页的条件请求校验头和内容哈希"""
+        await self.buffer_source_update(
+            source_id, {"etag": etag, "last_modified": last_modified, "content_hash": content_hash}
         )
     
+    async def buffer_source_update(self, source_id: str, updates: Dict):
+        """新闻源状态更新写入缓冲，与同一新闻源尚未写入的更新合并"""
+        self.write_buffer.source_updates.setdefault(ObjectId(source_id), {}).update(updates)
+        await self.write_buffer.add()
+    
     # News Items
-    async def create_news_item(self, item: NewsItem) -> str:
-        # 检查是否已存在相同URL的新闻
-        existing = await self.db.news_items.find_one({"url": item.url})
-        if existing:
-            return str(existing["_id"])
+    async def ensure_news_url_index(self):
+        """新闻URL唯一索引，保证并发爬取时同一URL只入库一次"""
+        try:
+            await self.db.news_items.create_index("url", unique=True)
+        except OperationFailure as e:
+            logger.error(f"创建新闻URL唯一索引失败（可能存在重复URL）: {e}")
+        self.url_index_ready = True
+    
+    async def upsert_news_items(self, items: List[NewsItem]) -> Tuple[int, int]:
+        """
+        批量保存新闻，返回(新增数, 重复数)。
         
-        result = await self.db.news_items.insert_one(item.dict(by_alias=True, exclude={"id"}))
-        return str(result.inserted_id)
+        每批一次无序bulk_write，按url做$setOnInsert upsert，已存在的新闻保持不变。
+        """
+        if not self.url_index_ready:
+            await self.ensure_news_url_index()
+        
+        if not self.known_urls_warmed:
+            await self.warm_known_urls()
+        
+        # 缓存中已知的URL和同一批内的重复URL不再写入
+        pending = {}
+        for item in items:
+            if item.url not in self.known_urls and item.url not in pending:
+                pending[item.url] = item
+        pending = list(pending.values())
+        inserted = 0
+        
+        batch_size = settings.INGEST_BATCH_SIZE
+        for i in range(0, len(pending), batch_size):
+            batch = pending[i:i + batch_size]
+            for item in batch:
+                await self.link_near_duplicate(item)
+            
+            # 指向同批内原始新闻的近似重复新闻，等原始新闻确认入库后再写入
+            saved: List[NewsItem] = []
+            remaining = batch
+            while remaining:
+                remaining_ids = {item.id for item in remaining}
+                ready = [item for item in remaining if item.canonical_id not in remaining_ids]
+                remaining = [item for item in remaining if item.canonical_id in remaining_ids]
+                
+                written = await self.write_news_batch(ready)
+                saved.extend(written)
+                written_ids = {item.id for item in written}
+                for item in remaining:
+                    if item.canonical_id not in written_ids:
+                        # 原始新闻未能入库（写入失败或URL已存在），重新查找原始新闻
+                        self.relink_near_duplicate(item)
+            
+            source_counts: Dict[str, int] = {}
+            for item in saved:
+                source_counts[item.source_name] = source_counts.get(item.source_name, 0) + 1
+            inserted += len(saved)
+            await self.record_stats("news_items", len(saved), sources=source_counts)
+            for item in saved:
+                self.publish_event("news_inserted", item.id)
+        
+        return inserted, len(items) - inserted
+    
+    async def write_news_batch(self, batch: List[NewsItem]) -> List[NewsItem]:
+        """
+        一次无序bulk_write写入一批新闻，返回实际新增的新闻。
+        
+        新增和URL已存在的新闻记入URL缓存；其他原因写入失败的新闻不记入缓存，下次爬取时重试。
+        """
+        if not batch:
+            return []
+        operations = [
+            UpdateOne({"url": item.url}, {"$setOnInsert": item.model_dump(by_alias=True)}, upsert=True)
+            for item in batch
+        ]
+        failed = set()
+        try:
+            result = await self.db.news_items.bulk_write(operations, ordered=False)
+            upserted = set(result.upserted_ids)
+        except BulkWriteError as e:
+            # 并发爬取同时插入同一URL时会出现唯一索引冲突，按重复处理
+            upserted = {entry["index"] for entry in e.details.get("upserted", [])}
+            for error in e.details.get("writeErrors", []):
+                if error.get("code") != DUPLICATE_KEY_ERROR:
+                    failed.add(error["index"])
+                    logger.error(f"保存新闻 {batch[error['index']].url} 失败: {error.get('errmsg')}")
+        
+        saved = []
+        for index, item in enumerate(batch):
+            if index in upserted:
+                saved.append(item)
+            else:
+                self.forget_fingerprint(item)
+            if index not in failed:
+                self.remember_url(item.url)
+        return saved
+    
+    async def link_near_duplicate(self, item: NewsItem):
+        """计算新闻指纹，与近期新闻近似重复时把canonical_id指向原始新闻"""
+        if not simhash_index.warmed:
+            await self.warm_simhash_index()
+        
+        fingerprint = simhash(f"{item.title}\n{item.content}")
+        if fingerprint is None:
+            return
+        
+        item.simhash = to_signed(fingerprint)
+        item.canonical_id = simhash_index.find(fingerprint)
+        if item.canonical_id is None:
+            simhash_index.add(fingerprint, item.id)
+    
+    def relink_near_duplicate(self, item: NewsItem):
+        """原始新闻未入库时重新查找原始新闻，找不到则本条作为原始新闻"""
+        fingerprint = to_unsigned(item.simhash)
+        item.canonical_id = simhash_index.find(fingerprint)
+        if item.canonical_id is None:
+            simhash_index.add(fingerprint, item.id)
     
-    async def get_unprocessed_news(self, limit: int = 10) -> List[NewsItem]:
-        cursor = self.db.news_items.find({"is_processed": False}).limit(limit)
-        items = []
+    def forget_fingerprint(self, item: NewsItem):
+        """新闻最终未入库时，把它的指纹从近似重复索引中移除"""
+        if item.simhash is not None and item.canonical_id is None:
+            simhash_index.remove(to_unsigned(item.simhash), item.id)
+    
+    async def warm_simhash_index(self):
+        """用时间窗口内原始新闻的指纹预热近似重复索引"""
+        from_time = datetime.now() - timedelta(hours=settings.DEDUP_WINDOW_HOURS)
+        cursor = self.db.news_items.find(
+            {"crawl_time": {"$gte": from_time}, "simhash": {"$ne": None}, "canonical_id": None},
+            {"simhash": 1, "crawl_time": 1}
+        ).sort("crawl_time", 1)
+        
         async for doc in cursor:
-            items.append(NewsItem(**doc))
-        return items
+            simhash_index.add(to_unsigned(doc["simhash"]), doc["_id"], doc["crawl_time"])
+        simhash_index.warmed = True
+    
+    def remember_url(self, url: str):
+        """记录已入库的URL，超出容量时淘汰最久未用的条目"""
+        self.known_urls[url] = None
+        self.known_urls.move_to_end(url)
+        while len(self.known_urls) > settings.KNOWN_URL_CACHE_SIZE:
+            self.known_urls.popitem(last=False)
+    
+    async def warm_known_urls(self):
+        """用最近入库的新闻URL预热缓存"""
+        cursor = self.db.news_items.find({}, {"url": 1, "_id": 0}).sort(
+            "crawl_time", -1
+        ).limit(settings.KNOWN_URL_CACHE_SIZE)
+        
+        urls = [doc["url"] async for doc in cursor if doc.get("url")]
+        for url in reversed(urls):
+            self.remember_url(url)
+        self.known_urls_warmed = True
     
-    async def mark_news_processed(self, news_id: str):
-        await self.db.news_items.update_one(
-            {"_id": news_id},
-            {"$set": {"is_processed": True}}
+    async def filter_new_urls(self, urls: List[str], batch_size: int = 500) -> List[str]:
+        """返回尚未入库的URL（保持原顺序并去重）"""
+        if not self.known_urls_warmed:
+            await self.warm_known_urls()
+        
+        candidates = []
+        for url in dict.fromkeys(urls):
+            if url in self.known_urls:
+                self.known_urls.move_to_end(url)
+            else:
+                candidates.append(url)
+        
+        # 缓存未命中的URL再批量到数据库确认
+        existing = set()
+        for i in range(0, len(candidates), batch_size):
+            batch = candidates[i:i + batch_size]
+            cursor = self.db.news_items.find({"url": {"$in": batch}}, {"url": 1, "_id": 0})
+            async for doc in cursor:
+                existing.add(doc["url"])
+                self.remember_url(doc["url"])
+        
+        return [url for url in candidates if url not in existing]
+    
+    async def claim_news(self, owner: str, lease_seconds: Optional[int] = None) -> Optional[NewsItem]:
+        """
+        原子地认领一条待分析新闻，没有可认领的新闻时返回None。
+        
+        未被认领或租约已过期（认领者中途退出）的新闻都可以被认领，按入库时间先后处理。
+        """
+        now = datetime.now()
+        doc = await self.db.news_items.find_one_and_update(
+            {
+                "is_processed": False,
+                "$or": [{"lease_expires": None}, {"lease_expires": {"$lt": now}}]
+            },
+            {"$set": {
+                "lease_owner": owner,
+                "lease_expires": now + timedelta(seconds=lease_seconds or settings.ANALYSIS_LEASE_SECONDS)
+            }},
+            sort=[("crawl_time", 1)],
+            return_document=ReturnDocument.AFTER
         )
+        if doc:
+            return NewsItem.model_validate(doc)
+        return None
+    
+    async def complete_news(self, news_id: str, owner: str):
+        """
+        标记认领的新闻已处理并释放租约（经写后缓冲批量写入）。
+        
+        只有仍持有租约时才会生效；写入前租约保持有效，其他工作进程不会重新认领。
+        """
+        self.write_buffer.completed_news.setdefault(owner, set()).add(ObjectId(news_id))
+        await self.write_buffer.add()
     
-    async def get_recent_news(self, hours: int = 24, limit: int = 50) -> List[NewsItem]:
+    async def get_news_by_id(self, news_id: str) -> Optional[NewsItem]:
+        doc = await self.db.news_items.find_one({"_id": ObjectId(news_id)})
+        if doc:
+            return NewsItem.model_validate(doc)
+        return None
+    
+    async def get_recent_news(self, hours: int = 24, limit: int = 50,
+                              after: Optional[str] = None) -> List[NewsItem]:
         from_time = datetime.now() - timedelta(hours=hours)
         cursor = self.db.news_items.find(
-            {"publish_time": {"$gte": from_time}}
-        ).sort("publish_time", -1).limit(limit)
-        
-        items = []
-        async for doc in cursor:
-            items.append(NewsItem(**doc))
-        return items
+            with_page({"publish_time": {"$gte": from_time}}, after, "publish_time")
+        ).sort([("publish_time", -1), ("_id", -1)]).limit(limit)
+        return NewsItemList.validate_python(await cursor.to_list(length=limit))
+    
+    def find_recent_news_docs(self, hours: int = 24, limit: int = 50, after: Optional[str] = None):
+        """最近新闻的列表视图游标，直接返回原始文档，不经过模型校验"""
+        from_time = datetime.now() - timedelta(hours=hours)
+        return self.db.news_items.find(
+            with_page({"publish_time": {"$gte": from_time}}, after, "publish_time"), NEWS_LIST_PROJECTION
+        ).sort([("publish_time", -1), ("_id", -1)]).limit(limit)
     
     # Analysis Results
     async def create_analysis_result(self, result: AnalysisResult) -> str:
-        doc = await self.db.analysis_results.insert_one(result.dict(by_alias=True, exclude={"id"}))
+        doc = await self.db.analysis_results.insert_one(result.model_dump(by_alias=True))
+        await self.record_stats("analysis_results")
+        self.publish_event("analysis_created", result)
         return str(doc.inserted_id)
     
     async def get_analysis_by_news_id(self, news_id: str) -> Optional[AnalysisResult]:
-        doc = await self.db.analysis_results.find_one({"news_id": news_id})
+        doc = await self.db.analysis_results.find_one({"news_id": ObjectId(news_id)})
         if doc:
-            return AnalysisResult(**doc)
+            return AnalysisResult.model_validate(doc)
         return None
     
-    async def get_important_analysis(self, min_importance: int = 4) -> List[AnalysisResult]:
+    async def get_important_analysis(self, min_importance: int = 4, limit: Optional[int] = None,
+                                     after: Optional[str] = None) -> List[AnalysisResult]:
         cursor = self.db.analysis_results.find(
-            {"importance": {"$gte": min_importance}}
-        ).sort("analysis_time", -1)
+            with_page({"importance": {"$gte": min_importance}}, after, "analysis_time")
+        ).sort([("analysis_time", -1), ("_id", -1)])
+        if limit:
+            cursor = cursor.limit(limit)
         
-        results = []
-        async for doc in cursor:
-            results.append(AnalysisResult(**doc))
-        return results
+        return AnalysisResultList.validate_python(await cursor.to_list(length=limit))
+    
+    def find_important_analysis_docs(self, min_importance: int = 4, limit: int = 20, after: Optional[str] = None):
+        """重要分析结果的列表视图游标，直接返回原始文档，不经过模型校验"""
+        return self.db.analysis_results.find(
+            with_page({"importance": {"$gte": min_importance}}, after, "analysis_time"), ANALYSIS_LIST_PROJECTION
+        ).sort([("analysis_time", -1), ("_id", -1)]).limit(limit)
     
     # Stock Info
     async def create_stock_info(self, stock: StockInfo) -> str:
-        result = await self.db.stocks.insert_one(stock.dict(by_alias=True, exclude={"id"}))
+        result = await self.db.stocks.insert_one(stock.model_dump(by_alias=True, exclude={"id"}))
         return str(result.inserted_id)
     
     async def get_stock_by_code(self, code: str) -> Optional[StockInfo]:
         doc = await self.db.stocks.find_one({"code": code})
         if doc:
-            return StockInfo(**doc)
+            return StockInfo.model_validate(doc)
         return None
     
     async def search_stocks_by_concept(self, concept: str) -> List[StockInfo]:
         cursor = self.db.stocks.find({"concepts": {"$in": [concept]}})
-        stocks = []
-        async for doc in cursor:
-            stocks.append(StockInfo(**doc))
-        return stocks
+        return StockInfoList.validate_python(await cursor.to_list(length=None))
     
     # Subscribers
     async def create_subscriber(self, subscriber: Subscriber) -> str:
-        result = await self.db.subscribers.insert_one(subscriber.dict(by_alias=True, exclude={"id"}))
+        result = await self.db.subscribers.insert_one(subscriber.model_dump(by_alias=True, exclude={"id"}))
+        if subscriber.is_active:
+            await self.record_stats("active_subscribers", daily=False)
         return str(result.inserted_id)
     
-    async def get_active_subscribers(self) -> List[Subscriber]:
-        cursor = self.db.subscribers.find({"is_active": True})
-        subscribers = []
-        async for doc in cursor:
-            subscribers.append(Subscriber(**doc))
-        return subscribers
+    async def get_active_subscribers(self, limit: Optional[int] = None,
+                                     after: Optional[str] = None) -> List[Subscriber]:
+        cursor = self.db.subscribers.find(
+            with_page({"is_active": True}, after, descending=False)
+        ).sort("_id", 1)
+        if limit:
+            cursor = cursor.limit(limit)
+        return SubscriberList.validate_python(await cursor.to_list(length=limit))
     
     async def get_subscriber_by_chat_id(self, chat_id: str) -> Optional[Subscriber]:
         doc = await self.db.subscribers.find_one({"chat_id": chat_id})
         if doc:
-            return Subscriber(**doc)
+            return Subscriber.model_validate(doc)
         return None
     
     # Alerts
     async def create_alert(self, alert: Alert) -> str:
-        result = await self.db.alerts.insert_one(alert.dict(by_alias=True, exclude={"id"}))
+        result = await self.db.alerts.insert_one(alert.model_dump(by_alias=True, exclude={"id"}))
+        await self.record_stats("alerts")
         return str(result.inserted_id)
     
+    async def create_alert_once(self, alert: Alert) -> Optional[str]:
+        """每个分析结果只创建一次警报，已存在时返回None（事件触发和定时检查可能同时处理同一结果）"""
+        try:
+            previous = await self.db.alerts.find_one_and_update(
+                {"analysis_id": alert.analysis_id},
+                {"$setOnInsert": alert.model_dump(by_alias=True)},
+                upsert=True,
+                projection={"_id": 1},
+                return_document=ReturnDocument.BEFORE
+            )
+        except DuplicateKeyError:
+            # 并发的upsert同时插入时，唯一索引只允许一个成功
+            return None
+        if previous:
+            return None
+        await self.record_stats("alerts")
+        return str(alert.id)
+    
+    async def buffer_stats(self, increments: Dict[str, int]):
+        """累加 totals 中的计数（经写后缓冲合并写入），用于高频且允许短暂延迟的计数"""
+        for field, amount in increments.items():
+            if amount > 0:
+                self.write_buffer.stat_increments[field] = self.write_buffer.stat_increments.get(field, 0) + amount
+        await self.write_buffer.add()
+    
     async def mark_alert_sent(self, alert_id: str, recipient: str):
-        await self.db.alerts.update_one(
-            {"_id": alert_id},
-            {"$addToSet": {"sent_to": recipient}}
-        )
+        self.write_buffer.alert_recipients.setdefault(ObjectId(alert_id), set()).add(recipient)
+        await self.write_buffer.add()
+    
+    # Stats
+    async def record_stats(self, field: str, amount: int = 1, sources: Optional[Dict[str, int]] = None,
+                           daily: bool = True):
+        """
+        增量更新统计计数。
+        
+        stats 集合中 totals 记录累计写入数，daily:YYYY-MM-DD 为每日直方图，
+        source:<新闻源> 为各新闻源的累计新闻数。计数失败只记录日志，不影响写入本身。
+        """
+        if amount <= 0:
+            return
+        
+        operations = [UpdateOne({"_id": "totals"}, {"$inc": {field: amount}}, upsert=True)]
+        if daily:
+            day = datetime.now().strftime("%Y-%m-%d")
+            operations.append(UpdateOne(
+                {"_id": f"daily:{day}"}, {"$inc": {field: amount}, "$setOnInsert": {"date": day}}, upsert=True
+            ))
+        for name, count in (sources or {}).items():
+            operations.append(UpdateOne(
+                {"_id": f"source:{name}"}, {"$inc": {"news_items": count}, "$setOnInsert": {"name": name}}, upsert=True
+            ))
+        
+        try:
+            await self.db.stats.bulk_write(operations, ordered=False)
+        except Exception as e:
+            logger.error(f"更新统计计数失败: {e}")
+    
+    async def rebuild_stats(self):
+        """
+        用聚合查询重新生成全部统计计数（首次启用统计或计数偏差时使用）
+        
+        新计数写入临时集合后整体改名替换 stats，读取方不会看到空的或只写了一半的计数。
+        只由 `main.py rebuild-stats` 调用，避免多个进程同时重建。
+        """
+        daily_fields = {"news_items": "crawl_time", "analysis_results": "analysis_time", "alerts": "created_time"}
+        totals = {"_id": "totals"}
+        daily: Dict[str, Dict] = {}
+        
+        for collection, time_field in daily_fields.items():
+            totals[collection] = await self.db[collection].count_documents({})
+            pipeline = [{"$group": {
+                "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": f"${time_field}"}},
+                "count": {"$sum": 1}
+            }}]
+            async for doc in self.db[collection].aggregate(pipeline):
+                if doc["_id"]:
+                    daily.setdefault(doc["_id"], {"_id": f"daily:{doc['_id']}", "date": doc["_id"]})[collection] = doc["count"]
+        totals["active_subscribers"] = await self.db.subscribers.count_documents({"is_active": True})
+        
+        sources = []
+        pipeline = [{"$group": {"_id": "$source_name", "count": {"$sum": 1}}}]
+        async for doc in self.db.news_items.aggregate(pipeline):
+            if doc["_id"]:
+                sources.append({"_id": f"source:{doc['_id']}", "name": doc["_id"], "news_items": doc["count"]})
+        
+        # 分析缓存计数无法从数据重新统计，沿用原值
+        previous = await self.db.stats.find_one({"_id": "totals"}) or {}
+        totals.update({field: value for field, value in previous.items() if field.startswith("llm_cache_")})
+        
+        staging = self.db[STATS_STAGING_COLLECTION]
+        await staging.drop()
+        await staging.insert_many([totals] + list(daily.values()) + sources)
+        await staging.rename("stats", dropTarget=True)
+        logger.info(f"统计计数已重建: {len(daily)} 天, {len(sources)} 个新闻源")
+    
+    async def check_stats(self):
+        """统计计数不存在时（首次启用）提示手动重建，启动时不自动重建"""
+        if not await self.db.stats.find_one({"_id": "totals"}, {"_id": 1}):
+            logger.warning("统计计数尚未初始化，请运行 python main.py rebuild-stats")
+    
+    async def get_stats_snapshot(self, days: Optional[int] = None) -> Dict:
+        """读取统计计数，各查询只访问少量固定文档或集合元数据"""
+        days = days or settings.STATS_HISTORY_DAYS
+        start = (datetime.now() - timedelta(days=days - 1)).strftime("%Y-%m-%d")
+        
+        totals = await self.db.stats.find_one({"_id": "totals"}) or {}
+        # ";" 紧跟在 ":" 之后，用 _id 前缀范围查询
+        daily_cursor = self.db.stats.find({"_id": {"$gte": f"daily:{start}", "$lt": "daily;"}}).sort("_id", 1)
+        source_cursor = self.db.stats.find({"_id": {"$gte": "source:", "$lt": "source;"}})
+        hits = totals.get("llm_cache_hits", 0)
+        misses = totals.get("llm_cache_misses", 0)
+        
+        return {
+            "total_news": await self.db.news_items.estimated_document_count(),
+            "total_analysis": await self.db.analysis_results.estimated_document_count(),
+            "total_alerts": await self.db.alerts.estimated_document_count(),
+            "active_subscribers": totals.get("active_subscribers", 0),
+            "ingested": {
+                field: totals.get(field, 0) for field in ("news_items", "analysis_results", "alerts")
+            },
+            "sources": {doc["name"]: doc.get("news_items", 0) async for doc in source_cursor},
+            "llm_cache": {
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+                "saved_tokens": totals.get("llm_cache_saved_tokens", 0)
+            },
+            "daily": [
+                {
+                    "date": doc["date"],
+                    "news_items": doc.get("news_items", 0),
+                    "analysis_results": doc.get("analysis_results", 0),
+                    "alerts": doc.get("alerts", 0)
+                }
+                async for doc in daily_cursor
+            ]
+        }
 
 # 全局数据库实例
 db = Database() 
\ No newline at end of file
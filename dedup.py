@@ -0,0 +1,123 @@
+"""
+近似重复新闻检测
+
+同一条公告常被多家媒体以不同URL转载。入库时对标题和正文计算64位SimHash，
+在最近新闻的LSH索引中查找汉明距离足够小的指纹，命中则把新条目关联到原始新闻。
+"""
+
+import hashlib
+import re
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from bson import ObjectId
+
+from config import settings
+
+FINGERPRINT_BITS = 64
+SHINGLE_SIZE = 3
+
+# 只保留文字和数字参与指纹计算
+NON_WORD_RE = re.compile(r'[\W_]+', re.UNICODE)
+
+
+def normalize_for_fingerprint(text: str) -> str:
+    return NON_WORD_RE.sub('', text).lower()
+
+
+def simhash(text: str) -> Optional[int]:
+    """计算文本的64位SimHash，文本过短时返回None"""
+    normalized = normalize_for_fingerprint(text)
+    if len(normalized) < settings.DEDUP_MIN_LENGTH:
+        return None
+
+    # 统计字符n-gram出现次数，相同片段只哈希一次
+    shingles: Dict[str, int] = {}
+    for i in range(len(normalized) - SHINGLE_SIZE + 1):
+        shingle = normalized[i:i + SHINGLE_SIZE]
+        shingles[shingle] = shingles.get(shingle, 0) + 1
+
+    hashes = np.array(
+        [hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest() for shingle in shingles],
+        dtype='S8'
+    )
+    counts = np.fromiter(shingles.values(), dtype=np.int64, count=len(shingles))
+
+    # 每个片段的哈希展开成64位，按出现次数对每一位加权投票
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1).astype(np.int64)
+    weights = counts @ (bits * 2 - 1)
+    return int.from_bytes(np.packbits(weights > 0).tobytes(), 'big')
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+
+def to_signed(fingerprint: int) -> int:
+    """MongoDB只支持有符号64位整数"""
+    return fingerprint - (1 << 64) if fingerprint >= 1 << 63 else fingerprint
+
+
+def to_unsigned(value: int) -> int:
+    return value + (1 << 64) if value < 0 else value
+
+
+class SimHashIndex:
+    """
+    最近新闻的SimHash LSH索引。
+
+    64位指纹切成 DEDUP_MAX_DISTANCE + 1 段，汉明距离不超过阈值的两个指纹
+    必然至少有一段完全相同，因此只需比较共享分段的候选。
+    """
+
+    def __init__(self):
+        self.bands = settings.DEDUP_MAX_DISTANCE + 1
+        self.band_bits = FINGERPRINT_BITS // self.bands
+        self.buckets: Dict[Tuple[int, int], List[Tuple[int, ObjectId]]] = {}
+        self.entries = deque()  # (加入时间, 指纹, 新闻ID)
+        self.warmed = False
+
+    def band_keys(self, fingerprint: int):
+        mask = (1 << self.band_bits) - 1
+        for band in range(self.bands):
+            yield band, fingerprint >> (band * self.band_bits) & mask
+
+    def find(self, fingerprint: int) -> Optional[ObjectId]:
+        """查找近似重复的新闻，返回距离最近的新闻ID"""
+        self.expire()
+        best = None
+        best_distance = settings.DEDUP_MAX_DISTANCE + 1
+        for key in self.band_keys(fingerprint):
+            for candidate, news_id in self.buckets.get(key, ()):
+                distance = hamming_distance(fingerprint, candidate)
+                if distance < best_distance:
+                    best, best_distance = news_id, distance
+        return best
+
+    def add(self, fingerprint: int, news_id: ObjectId, added_time: Optional[datetime] = None):
+        self.entries.append((added_time or datetime.now(), fingerprint, news_id))
+        for key in self.band_keys(fingerprint):
+            self.buckets.setdefault(key, []).append((fingerprint, news_id))
+        self.expire()
+
+    def remove(self, fingerprint: int, news_id: ObjectId):
+        """移除指纹（新闻最终未入库时使用）"""
+        for key in self.band_keys(fingerprint):
+            bucket = self.buckets.get(key)
+            if bucket and (fingerprint, news_id) in bucket:
+                bucket.remove((fingerprint, news_id))
+                if not bucket:
+                    del self.buckets[key]
+    
+    def expire(self):
+        """淘汰超出时间窗口或容量的旧指纹"""
+        cutoff = datetime.now() - timedelta(hours=settings.DEDUP_WINDOW_HOURS)
+        while self.entries and (self.entries[0][0] < cutoff or len(self.entries) > settings.DEDUP_INDEX_SIZE):
+            _, fingerprint, news_id = self.entries.popleft()
+            self.remove(fingerprint, news_id)
+
+
+# 全局近似重复索引
+simhash_index = SimHashIndex()
@@ -0,0 +1,308 @@
+"""
+网页解析函数
+
+这些函数在解析进程池中执行，只返回提取出的文本和链接，
+因此不能依赖数据库、配置等需要在主进程初始化的模块。
+"""
+
+import codecs
+import json
+import re
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, List, Optional
+from urllib.parse import urljoin
+
+import feedparser
+import soupsieve
+from bs4 import BeautifulSoup
+from charset_normalizer import from_bytes
+from lxml import etree
+
+# 正文容器选择器，按优先级排列
+CONTENT_SELECTORS = [
+    'div.content', 'div.article-content', 'div.news-content',
+    'div.main-content', 'article', '.article-body', '.content-body'
+]
+
+MAX_CONTENT_LENGTH = 5000
+
+# 从网页头部嗅探编码
+META_CHARSET_RE = re.compile(rb'<meta[^>]+charset=["\']?\s*([A-Za-z0-9_\-]+)', re.IGNORECASE)
+
+# 国内站点常把GBK页面标成gb2312，统一按超集解码
+CHARSET_ALIASES = {"gb2312": "gb18030", "gbk": "gb18030", "x-gbk": "gb18030"}
+
+
+def guess_charset(head: bytes) -> Optional[str]:
+    """按字节内容推测编码（charset_normalizer），纯ASCII或无法判断时返回None"""
+    match = from_bytes(head).best()
+    if match is None or match.encoding == "ascii":
+        return None
+    # 统一为标准编码名（如 utf_8 -> utf-8），lxml可以识别
+    return codecs.lookup(match.encoding).name
+
+
+def detect_charset(header_charset: Optional[str], head: bytes) -> Optional[str]:
+    """确定网页编码：优先响应头，其次页面meta声明，都没有时按内容推测"""
+    charset = header_charset
+    if not charset:
+        match = META_CHARSET_RE.search(head[:4096])
+        if match:
+            charset = match.group(1).decode("ascii")
+    if not charset:
+        charset = guess_charset(head)
+    if charset:
+        charset = charset.lower()
+        return CHARSET_ALIASES.get(charset, charset)
+    return None
+
+
+def make_soup(body: bytes, charset: Optional[str] = None) -> BeautifulSoup:
+    """使用lxml构建文档树"""
+    return BeautifulSoup(body, 'lxml', from_encoding=charset)
+
+
+def normalize_text(content: str) -> str:
+    """压缩空白并截断到最大长度"""
+    return re.sub(r'\s+', ' ', content).strip()[:MAX_CONTENT_LENGTH]
+
+
+def extract_article_text(body: bytes, charset: Optional[str] = None) -> str:
+    """提取网页正文内容"""
+    soup = make_soup(body, charset)
+
+    # 移除脚本和样式
+    for script in soup(["script", "style"]):
+        script.decompose()
+
+    # 尝试找到正文内容
+    content = ""
+    for selector in CONTENT_SELECTORS:
+        element = soup.select_one(selector)
+        if element:
+            content = element.get_text()
+            break
+
+    if not content:
+        # 如果没找到特定选择器，获取所有p标签内容
+        paragraphs = soup.find_all('p')
+        content = '\n'.join([p.get_text() for p in paragraphs])
+
+    # 清理文本
+    return normalize_text(content)
+
+
+def _container_rules():
+    """把正文选择器转换为(标签, class)规则，供流式解析匹配"""
+    rules = []
+    for selector in CONTENT_SELECTORS:
+        tag, _, css_class = selector.partition('.')
+        rules.append((tag or None, css_class or None))
+    return rules
+
+CONTAINER_RULES = _container_rules()
+
+
+def is_content_container(elem) -> bool:
+    classes = (elem.get('class') or '').split()
+    for tag, css_class in CONTAINER_RULES:
+        if tag and elem.tag != tag:
+            continue
+        if css_class and css_class not in classes:
+            continue
+        return True
+    return False
+
+
+def extract_article_text_streaming(body: bytes, charset: Optional[str] = None, chunk_size: int = 16 * 1024) -> str:
+    """用增量提取器从完整网页中提取正文，结果与边下载边提取一致"""
+    extractor = ArticleStreamExtractor(charset)
+    for start in range(0, len(body), chunk_size):
+        if extractor.feed(body[start:start + chunk_size]):
+            break
+    return extractor.close()
+
+
+class ArticleStreamExtractor:
+    """
+    增量提取正文：边下载边解析，找到正文容器并收集到足够文字后即可停止下载。
+
+    与 extract_article_text 的区别在于正文容器按文档顺序取第一个非空的，
+    而不是按选择器优先级在整页中查找。
+    """
+
+    def __init__(self, charset: Optional[str] = None, max_length: int = MAX_CONTENT_LENGTH):
+        self.parser = etree.HTMLPullParser(events=("start", "end"), encoding=charset)
+        self.max_length = max_length
+        self.container = None
+        self.collected = 0
+        self.next_check = max_length
+        self.content = ""
+        self.paragraphs: List[str] = []
+        self.paragraph_length = 0
+        self.done = False
+
+    def feed(self, chunk: bytes) -> bool:
+        """输入一个数据块，返回True表示正文已足够，可以停止下载"""
+        if not self.done:
+            self.parser.feed(chunk)
+            self._process_events()
+        return self.done
+
+    def close(self) -> str:
+        """结束解析并返回正文"""
+        if not self.done:
+            try:
+                self.parser.close()
+            except etree.LxmlError:
+                pass
+            self._process_events()
+            if self.container is not None:
+                self.content = self._container_text()
+
+        content = self.content or '\n'.join(self.paragraphs)
+        return normalize_text(content)
+
+    def _container_text(self) -> str:
+        return normalize_text(''.join(self.container.itertext()))
+
+    def _process_events(self):
+        for event, elem in self.parser.read_events():
+            if self.done or not isinstance(elem.tag, str):
+                continue
+
+            if event == "start":
+                if self.container is None and is_content_container(elem):
+                    self.container = elem
+                continue
+
+            # 脚本和样式不计入正文
+            if elem.tag in ("script", "style"):
+                elem.clear(keep_tail=True)
+                continue
+
+            if self.container is None:
+                if elem.tag == 'p' and self.paragraph_length < self.max_length:
+                    text = ''.join(elem.itertext())
+                    self.paragraphs.append(text)
+                    self.paragraph_length += len(text)
+                # 正文容器之外的元素处理完即释放
+                elem.clear(keep_tail=True)
+                continue
+
+            if elem is self.container:
+                text = self._container_text()
+                if text:
+                    self.content = text
+                    self.done = True
+                else:
+                    self.container = None
+                    elem.clear(keep_tail=True)
+                continue
+
+            self.collected += len(elem.text or '') + len(elem.tail or '')
+            if self.collected >= self.next_check:
+                text = self._container_text()
+                if len(text) >= self.max_length:
+                    self.content = text
+                    self.done = True
+                else:
+                    self.next_check = self.collected + self.max_length - len(text)
+
+
+@lru_cache(maxsize=256)
+def compile_selector(selector: str) -> soupsieve.SoupSieve:
+    """编译并缓存CSS选择器，同一工作进程内的后续解析直接复用"""
+    return soupsieve.compile(selector)
+
+
+def parse_listing(body: bytes, charset: Optional[str], base_url: str,
+                  item_selector: str, link_selector: str = 'a',
+                  time_selector: Optional[str] = None) -> List[Dict[str, str]]:
+    """解析列表页，返回每条新闻的标题、链接和时间文本"""
+    soup = make_soup(body, charset)
+    link_matcher = compile_selector(link_selector)
+    time_matcher = compile_selector(time_selector) if time_selector else None
+
+    rows = []
+    for item in compile_selector(item_selector).select(soup):
+        link_elem = link_matcher.select_one(item)
+        if not link_elem or not link_elem.get('href'):
+            continue
+
+        time_str = ""
+        if time_matcher:
+            time_elem = time_matcher.select_one(item)
+            if time_elem:
+                time_str = time_elem.get_text().strip()
+
+        rows.append({
+            "title": link_elem.get_text().strip(),
+            "url": urljoin(base_url, link_elem.get('href')),
+            "time": time_str
+        })
+
+    return rows
+
+
+def parse_json_listing(body: bytes, base_url: str, items_path: str,
+                       fields: Dict[str, str]) -> List[Dict[str, str]]:
+    """
+    解析JSON列表接口。
+
+    items_path 为点分隔的条目数组路径（如 "result.data"，数字表示数组下标），
+    fields 把 title/url/time 映射到条目中的字段名。
+    """
+    data = json.loads(body)
+    for key in items_path.split('.') if items_path else []:
+        if isinstance(data, dict):
+            data = data.get(key)
+        elif isinstance(data, list) and key.isdigit() and int(key) < len(data):
+            # 数字路径段表示数组下标，如 "data.0.list"
+            data = data[int(key)]
+        else:
+            data = None
+
+    rows = []
+    for item in data if isinstance(data, list) else []:
+        if not isinstance(item, dict):
+            continue
+        url = item.get(fields.get("url", "url"))
+        if not url:
+            continue
+        rows.append({
+            "title": str(item.get(fields.get("title", "title"), "")).strip(),
+            "url": urljoin(base_url, url),
+            "time": str(item.get(fields.get("time", "time"), "") or "").strip()
+        })
+
+    return rows
+
+
+def parse_feed(body: bytes) -> List[Dict]:
+    """解析RSS/Atom内容，返回条目的标题、链接、正文和发布时间"""
+    feed = feedparser.parse(body)
+
+    entries = []
+    for entry in feed.entries:
+        link = entry.get('link')
+        if not link:
+            continue
+
+        content = entry.get('description', '')
+        if entry.get('content'):
+            content = entry.content[0].value
+
+        publish_time = None
+        if entry.get('published_parsed'):
+            publish_time = datetime(*entry.published_parsed[:6])
+
+        entries.append({
+            "title": entry.get('title', ''),
+            "url": link,
+            "content": content,
+            "publish_time": publish_time
+        })
+
+    return entries
@@ -0,0 +1,218 @@
+import asyncio
+import aiohttp
+import random
+import time
+from typing import Awaitable, Callable, Dict, Optional
+from urllib.parse import quote, urlparse
+import logging
+
+from config import settings
+from extractor import detect_charset
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 可重试的HTTP状态码（限流和服务端错误）
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+CHUNK_SIZE = 16 * 1024
+
+class TokenBucket:
+    """令牌桶限速器"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self, amount: float = 1):
+        """获取amount个令牌（超过容量时按容量计），令牌不足时等待"""
+        amount = min(amount, self.capacity)
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+class HostStats:
+    """单个站点的请求统计"""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.status_counts: Dict[int, int] = {}
+
+    def record(self, latency: float, status: Optional[int] = None, error: bool = False):
+        self.requests += 1
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+        if status is not None:
+            self.status_counts[status] = self.status_counts.get(status, 0) + 1
+        if error:
+            self.errors += 1
+
+    def to_dict(self) -> Dict:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "retries": self.retries,
+            "avg_latency": round(self.total_latency / self.requests, 3) if self.requests else 0.0,
+            "max_latency": round(self.max_latency, 3),
+            "status_counts": dict(self.status_counts),
+        }
+
+# 进程内累计的各站点统计
+host_stats: Dict[str, HostStats] = {}
+
+def get_host_stats() -> Dict[str, Dict]:
+    """获取各站点的请求统计"""
+    return {host: stats.to_dict() for host, stats in host_stats.items()}
+
+# 进程内各站点共用的令牌桶，多个客户端实例（如每轮爬取新建的客户端）共同遵守站点限速
+host_buckets: Dict[str, TokenBucket] = {}
+
+def get_host_bucket(host: str) -> TokenBucket:
+    """获取站点的令牌桶，不存在时按配置创建"""
+    if host not in host_buckets:
+        host_buckets[host] = TokenBucket(settings.CRAWL_HOST_RATE, settings.CRAWL_HOST_BURST)
+    return host_buckets[host]
+
+class FetchResult:
+    """一次HTTP请求的结果"""
+
+    def __init__(self, url: str, status: int, headers, body: bytes, charset: Optional[str],
+                 truncated: bool = False):
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.charset = charset
+        self.truncated = truncated  # 因字节上限或提前结束而未读完
+
+class CrawlerHttpClient:
+    """
+    爬虫HTTP客户端：按站点限制连接数和请求速率，失败时指数退避重试。
+
+    recorder 不为空时把每个响应写入录制目录；replay_url 不为空时所有请求改发到
+    本地回放服务器（见 replay.py），此时不做站点限速。
+    """
+
+    def __init__(self, recorder=None, replay_url: Optional[str] = None):
+        self.session = None
+        self.recorder = recorder
+        self.replay_url = replay_url
+
+    async def start(self):
+        connector = aiohttp.TCPConnector(
+            limit=settings.CRAWL_CONNECTION_LIMIT,
+            limit_per_host=0 if self.replay_url else settings.CRAWL_CONNECTIONS_PER_HOST,
+            use_dns_cache=True,
+            ttl_dns_cache=settings.CRAWL_DNS_CACHE_TTL
+        )
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=settings.REQUEST_TIMEOUT),
+            headers={"User-Agent": settings.USER_AGENT}
+        )
+
+    async def close(self):
+        if self.session:
+            await self.session.close()
+
+    def backoff_delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """计算重试等待时间：优先使用Retry-After，否则使用带随机抖动的指数退避"""
+        if retry_after:
+            try:
+                return min(settings.RETRY_BACKOFF_MAX, float(retry_after))
+            except ValueError:
+                pass
+        return random.uniform(0, min(settings.RETRY_BACKOFF_MAX, settings.RETRY_BACKOFF_BASE * 2 ** attempt))
+
+    async def read_body(self, response, max_bytes: Optional[int],
+                        on_chunk: Optional[Callable[[bytes, Optional[str]], Awaitable[bool]]]):
+        """分块读取响应体，超过字节上限或on_chunk返回True时停止"""
+        body = bytearray()
+        charset = None
+        truncated = False
+
+        async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+            if max_bytes is not None and len(body) + len(chunk) > max_bytes:
+                chunk = chunk[:max_bytes - len(body)]
+                truncated = True
+            if not body:
+                charset = detect_charset(response.charset, chunk)
+            body.extend(chunk)
+
+            if on_chunk and chunk and await on_chunk(chunk, charset):
+                truncated = True
+                break
+            if truncated:
+                break
+
+        if charset is None:
+            charset = detect_charset(response.charset, bytes(body[:4096]))
+        return bytes(body), charset, truncated
+
+    async def fetch(self, url: str, headers: Optional[Dict[str, str]] = None,
+                    max_bytes: Optional[int] = None,
+                    on_chunk: Optional[Callable[[bytes, Optional[str]], Awaitable[bool]]] = None) -> FetchResult:
+        """
+        请求URL，失败时最多重试 RETRY_TIMES 次。
+
+        max_bytes 限制读取的字节数；on_chunk 逐块接收响应体（附带检测到的编码），
+        返回True时提前结束下载。响应体开始交给on_chunk后不再重试。
+        """
+        host = urlparse(url).netloc
+        stats = host_stats.setdefault(host, HostStats())
+        request_url = url
+        if self.replay_url:
+            request_url = f"{self.replay_url}/replay?url={quote(url, safe='')}"
+
+        for attempt in range(settings.RETRY_TIMES + 1):
+            if not self.replay_url:
+                await get_host_bucket(host).acquire()
+            if attempt > 0:
+                stats.retries += 1
+
+            start = time.monotonic()
+            streaming = False
+            try:
+                async with self.session.get(request_url, headers=headers) as response:
+                    if response.status in RETRY_STATUS and attempt < settings.RETRY_TIMES:
+                        stats.record(time.monotonic() - start, response.status, error=True)
+                        delay = self.backoff_delay(attempt, response.headers.get("Retry-After"))
+                        logger.warning(f"请求 {url} 返回 {response.status}，{delay:.1f} 秒后重试")
+                    else:
+                        if response.status >= 400:
+                            stats.record(time.monotonic() - start, response.status, error=True)
+                            response.raise_for_status()
+
+                        streaming = on_chunk is not None
+                        body, charset, truncated = await self.read_body(response, max_bytes, on_chunk)
+                        stats.record(time.monotonic() - start, response.status)
+                        if self.recorder:
+                            self.recorder.record(url, response.status, response.headers, body)
+                        return FetchResult(url, response.status, response.headers, body, charset, truncated)
+
+            except aiohttp.ClientResponseError:
+                raise
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                stats.record(time.monotonic() - start, error=True)
+                if streaming or attempt >= settings.RETRY_TIMES:
+                    raise
+                delay = self.backoff_delay(attempt)
+                logger.warning(f"请求 {url} 失败: {e!r}，{delay:.1f} 秒后重试")
+
+            # 退出响应上下文、连接归还连接池后再等待，退避期间不占用站点连接
+            await asyncio.sleep(delay)
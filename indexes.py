@@ -0,0 +1,239 @@
+"""
+MongoDB索引管理
+
+INDEXES 按集合声明 database.py 中各热点查询需要的索引，启动时由 ensure_indexes 创建
+（已存在的索引不会重复创建）。hot_queries 列出这些查询的代表形式，
+verify_indexes 用 explain() 检查实际执行计划，找出退化为全集合扫描（COLLSCAN）的查询。
+
+复合索引按"等值字段 - 排序字段 - 范围字段"的顺序排列，使排序可以直接走索引。
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+import logging
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+from config import settings
+from database import db
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 同名索引选项冲突（IndexOptionsConflict / IndexKeySpecsConflict）的错误码
+INDEX_CONFLICT_CODES = {85, 86}
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    "news_sources": [
+        IndexModel([("url", ASCENDING)], unique=True),
+        IndexModel([("is_active", ASCENDING)]),
+    ],
+    "news_items": [
+        IndexModel([("url", ASCENDING)], unique=True),
+        # 待分析新闻：is_processed 等值查询，按入库时间先后取
+        IndexModel([("is_processed", ASCENDING), ("crawl_time", ASCENDING)]),
+        # 最近新闻按 (publish_time, _id) 分页
+        IndexModel([("publish_time", DESCENDING), ("_id", DESCENDING)]),
+        # 预热URL缓存和近似重复索引按入库时间扫描，使用 retention.py 在 crawl_time 上建的TTL索引
+    ],
+    "analysis_results": [
+        IndexModel([("news_id", ASCENDING)]),
+        # 按 (analysis_time, _id) 分页；importance 是范围条件，放在排序字段之后
+        IndexModel([("analysis_time", DESCENDING), ("_id", DESCENDING), ("importance", ASCENDING)]),
+    ],
+    "alerts": [
+        # 每个分析结果只能有一条警报，create_alert_once 依赖唯一索引防止并发重复插入
+        IndexModel([("analysis_id", ASCENDING)], unique=True),
+    ],
+    "stocks": [
+        IndexModel([("code", ASCENDING)]),
+        IndexModel([("concepts", ASCENDING)]),
+    ],
+    "subscribers": [
+        IndexModel([("chat_id", ASCENDING)]),
+        IndexModel([("is_active", ASCENDING), ("_id", ASCENDING)]),
+    ],
+}
+
+
+# 建唯一索引前需要清理重复数据的集合：唯一字段、保留哪条（排序后的第一条）、合并到保留文档的数组字段
+UNIQUE_DEDUP: Dict[str, Dict] = {
+    # 同一URL保留最近爬取过的新闻源，爬取状态最新
+    "news_sources": {"field": "url", "keep": [("last_crawled", DESCENDING), ("_id", ASCENDING)]},
+    # 同一分析结果保留最早的警报，合并已发送的订阅者，避免重复推送
+    "alerts": {"field": "analysis_id", "keep": [("_id", ASCENDING)], "merge": "sent_to"},
+}
+
+
+# 已不再声明、启动时从现有数据库中删除的索引
+STALE_INDEXES: Dict[str, List[str]] = {
+    # 与 crawl_time 上的TTL索引重复
+    "news_items": ["crawl_time_-1"],
+}
+
+
+def hot_queries() -> List[Dict]:
+    """database.py 中热点查询的代表形式，用于检查执行计划"""
+    now = datetime.now()
+    return [
+        {"name": "获取活跃新闻源", "collection": "news_sources", "filter": {"is_active": True}},
+        {"name": "按URL查找新闻源", "collection": "news_sources", "filter": {"url": ""}},
+        {"name": "按URL查找新闻", "collection": "news_items", "filter": {"url": {"$in": [""]}}},
+        {"name": "认领待分析新闻", "collection": "news_items",
+         "filter": {"is_processed": False, "$or": [{"lease_expires": None}, {"lease_expires": {"$lt": now}}]},
+         "sort": [("crawl_time", ASCENDING)], "limit": 1},
+        {"name": "最近新闻", "collection": "news_items", "filter": {"publish_time": {"$gte": now - timedelta(hours=24)}},
+         "sort": [("publish_time", DESCENDING), ("_id", DESCENDING)], "limit": 50},
+        {"name": "预热URL缓存", "collection": "news_items", "filter": {},
+         "sort": [("crawl_time", DESCENDING)], "limit": settings.KNOWN_URL_CACHE_SIZE},
+        {"name": "预热近似重复索引", "collection": "news_items",
+         "filter": {"crawl_time": {"$gte": now - timedelta(hours=settings.DEDUP_WINDOW_HOURS)}, "simhash": {"$ne": None}, "canonical_id": None},
+         "sort": [("crawl_time", ASCENDING)]},
+        {"name": "按新闻查找分析", "collection": "analysis_results", "filter": {"news_id": ObjectId()}},
+        {"name": "重要分析结果", "collection": "analysis_results", "filter": {"importance": {"$gte": 4}},
+         "sort": [("analysis_time", DESCENDING), ("_id", DESCENDING)], "limit": 20},
+        {"name": "按分析结果查找警报", "collection": "alerts", "filter": {"analysis_id": ObjectId()}},
+        {"name": "按代码查找股票", "collection": "stocks", "filter": {"code": ""}},
+        {"name": "按概念查找股票", "collection": "stocks", "filter": {"concepts": {"$in": [""]}}},
+        {"name": "活跃订阅者", "collection": "subscribers", "filter": {"is_active": True},
+         "sort": [("_id", ASCENDING)], "limit": 100},
+        {"name": "按chat_id查找订阅者", "collection": "subscribers", "filter": {"chat_id": ""}},
+    ]
+
+
+async def create_indexes(collection: str, indexes: List[IndexModel]) -> List[str]:
+    """创建索引，同名索引的选项变化（如改为唯一索引）时删除旧索引后重建"""
+    try:
+        return await db.db[collection].create_indexes(indexes)
+    except OperationFailure as e:
+        if e.code not in INDEX_CONFLICT_CODES:
+            raise
+        existing = await db.db[collection].index_information()
+        for index in indexes:
+            name = index.document["name"]
+            if name in existing and existing[name].get("unique", False) != index.document.get("unique", False):
+                logger.warning(f"{collection} 索引 {name} 选项已变化，删除后重建")
+                await db.db[collection].drop_index(name)
+        return await db.db[collection].create_indexes(indexes)
+
+
+async def dedupe_unique_field(collection: str, field: str, keep: List, merge: Optional[str] = None) -> int:
+    """
+    删除唯一字段重复的文档，每组只保留排序后的第一条，返回删除数量
+
+    唯一索引已存在时说明没有重复数据，直接跳过，不在每次启动时扫描集合。
+    """
+    existing = await db.db[collection].index_information()
+    if any(info["key"] == [(field, ASCENDING)] and info.get("unique") for info in existing.values()):
+        return 0
+
+    group = {"_id": f"${field}", "ids": {"$push": "$_id"}, "count": {"$sum": 1}}
+    if merge:
+        group["merged"] = {"$push": {"$ifNull": [f"${merge}", []]}}
+    pipeline = [{"$sort": dict(keep)}, {"$group": group}, {"$match": {"count": {"$gt": 1}}}]
+
+    deleted = 0
+    async for doc in db.db[collection].aggregate(pipeline, allowDiskUse=True):
+        kept, duplicates = doc["ids"][0], doc["ids"][1:]
+        if merge:
+            values = [value for values in doc["merged"] for value in values]
+            await db.db[collection].update_one({"_id": kept}, {"$addToSet": {merge: {"$each": values}}})
+        result = await db.db[collection].delete_many({"_id": {"$in": duplicates}})
+        deleted += result.deleted_count
+    if deleted:
+        logger.warning(f"{collection} 中 {field} 存在重复，已删除 {deleted} 条重复文档")
+    return deleted
+
+
+async def drop_stale_indexes(collection: str):
+    existing = await db.db[collection].index_information()
+    for name in STALE_INDEXES.get(collection, []):
+        if name in existing:
+            logger.info(f"删除 {collection} 中不再使用的索引 {name}")
+            await db.db[collection].drop_index(name)
+
+
+async def ensure_indexes():
+    """创建所有声明的索引，建唯一索引前先清理重复数据"""
+    for collection, indexes in INDEXES.items():
+        try:
+            if collection in UNIQUE_DEDUP:
+                await dedupe_unique_field(collection, **UNIQUE_DEDUP[collection])
+            names = await create_indexes(collection, indexes)
+            await drop_stale_indexes(collection)
+            logger.info(f"{collection} 索引就绪: {', '.join(names)}")
+        except OperationFailure as e:
+            logger.error(f"创建 {collection} 索引失败: {e}")
+        else:
+            if collection == "news_items":
+                db.url_index_ready = True
+
+
+def plan_stages(plan) -> List[str]:
+    """递归收集执行计划中的所有阶段名"""
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(plan_stages(value))
+    elif isinstance(plan, list):
+        for value in plan:
+            stages.extend(plan_stages(value))
+    return stages
+
+
+async def explain_query(query: Dict) -> Dict:
+    """用explain()获取查询的获胜执行计划"""
+    cursor = db.db[query["collection"]].find(query["filter"])
+    if query.get("sort"):
+        cursor = cursor.sort(query["sort"])
+    if query.get("limit"):
+        cursor = cursor.limit(query["limit"])
+
+    explain = await cursor.explain()
+    winning_plan = explain.get("queryPlanner", {}).get("winningPlan", {})
+    stages = plan_stages(winning_plan)
+    return {
+        "name": query["name"],
+        "collection": query["collection"],
+        "stages": stages,
+        "collscan": "COLLSCAN" in stages,
+        "in_memory_sort": "SORT" in stages,
+    }
+
+
+async def verify_indexes(queries: Optional[List[Dict]] = None) -> List[Dict]:
+    """检查热点查询的执行计划，退化为全集合扫描的查询记录警告"""
+    reports = []
+    for query in queries or hot_queries():
+        try:
+            report = await explain_query(query)
+        except OperationFailure as e:
+            logger.error(f"检查查询 {query['name']} 的执行计划失败: {e}")
+            continue
+        if report["collscan"]:
+            logger.warning(f"查询 {report['name']} ({report['collection']}) 使用了全集合扫描")
+        reports.append(report)
+    return reports
+
+
+async def bootstrap_indexes():
+    """启动时创建索引并检查热点查询"""
+    await ensure_indexes()
+    await verify_indexes()
+
+
+def print_index_report(reports: List[Dict]) -> int:
+    """打印执行计划检查结果，返回全集合扫描的查询数"""
+    print(f"{'查询':<16}{'集合':<18}{'执行计划'}")
+    for report in reports:
+        flag = "❌" if report["collscan"] else "⚠️" if report["in_memory_sort"] else "✅"
+        print(f"{flag} {report['name']:<14}{report['collection']:<18}{' <- '.join(report['stages'])}")
+
+    collscans = sum(1 for report in reports if report["collscan"])
+    sorts = sum(1 for report in reports if report["in_memory_sort"])
+    print(f"\n共检查 {len(reports)} 个查询，{collscans} 个使用全集合扫描，{sorts} 个需要内存排序")
+    return collscans
@@ -0,0 +1,153 @@
+"""
+LLM分析结果缓存
+
+以"归一化后的标题和正文 + 提示词版本 + 模型"的哈希为键缓存分析结果：重新爬取的新闻、
+URL变化的新闻以及内容相同的通稿都能直接复用已有结果，不再调用API。
+进程内LRU缓存在前，MongoDB的 llm_cache 集合持久化并在进程间共享；条目由TTL索引在
+LLM_CACHE_TTL_DAYS 后删除，超过 LLM_CACHE_MAX_ENTRIES 时由清理任务淘汰最久未用的条目。
+提示词模板变化后版本随之变化，旧条目不再命中。
+"""
+
+import hashlib
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+import logging
+
+from pymongo.errors import OperationFailure
+
+from config import settings
+from database import db
+from retention import ensure_ttl_index
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CACHE_COLLECTION = "llm_cache"
+
+WHITESPACE = re.compile(r"\s+")
+
+
+def prompt_version() -> str:
+    """提示词模板的版本：单条和批量模板内容的哈希"""
+    templates = settings.ANALYSIS_PROMPT_TEMPLATE + settings.ANALYSIS_BATCH_PROMPT_TEMPLATE
+    return hashlib.sha256(templates.encode("utf-8")).hexdigest()[:12]
+
+
+def normalize_text(text: str) -> str:
+    """全半角统一、去除大小写和空白差异"""
+    return WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text)).strip().lower()
+
+
+class AnalysisCache:
+    """进程内LRU + MongoDB 两级分析结果缓存"""
+
+    def __init__(self):
+        # 缓存键 -> (分析结果字段, 过期时刻monotonic, 估计token数)
+        self.memory: OrderedDict[str, Tuple[Dict, float, int]] = OrderedDict()
+        self.version = prompt_version()
+
+    def key(self, title: str, content: str, model: Optional[str] = None) -> str:
+        """分析结果的缓存键，正文按提示词中实际使用的长度截取"""
+        parts = [
+            self.version,
+            model or settings.ANALYSIS_MODEL,
+            normalize_text(title),
+            normalize_text(content[:2000]),
+        ]
+        return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+    def remember(self, key: str, data: Dict, ttl: float, tokens: int):
+        """写入进程内缓存，超出容量时淘汰最久未用的条目"""
+        self.memory[key] = (data, time.monotonic() + ttl, tokens)
+        self.memory.move_to_end(key)
+        while len(self.memory) > settings.LLM_CACHE_MEMORY_SIZE:
+            self.memory.popitem(last=False)
+
+    async def get(self, key: str) -> Optional[Dict]:
+        """查找缓存的分析结果，命中时返回字段副本"""
+        if not settings.LLM_CACHE_ENABLED:
+            return None
+
+        entry = self.memory.get(key)
+        if entry and entry[1] > time.monotonic():
+            self.memory.move_to_end(key)
+            await self.record_hit(entry[2])
+            return dict(entry[0])
+        if entry:
+            del self.memory[key]
+
+        now = datetime.now()
+        ttl = timedelta(days=settings.LLM_CACHE_TTL_DAYS)
+        try:
+            doc = await db.db[CACHE_COLLECTION].find_one_and_update(
+                {"_id": key, "created_at": {"$gte": now - ttl}},
+                {"$set": {"last_used": now}, "$inc": {"hits": 1}}
+            )
+        except Exception as e:
+            logger.error(f"读取分析缓存失败: {e}")
+            return None
+
+        if not doc:
+            await db.buffer_stats({"llm_cache_misses": 1})
+            return None
+
+        remaining = (doc["created_at"] + ttl - now).total_seconds()
+        self.remember(key, doc["data"], remaining, doc.get("tokens", 0))
+        await self.record_hit(doc.get("tokens", 0))
+        return dict(doc["data"])
+
+    async def put(self, key: str, data: Dict, tokens: int = 0):
+        """保存分析结果，tokens为生成该结果大约消耗的token数"""
+        if not settings.LLM_CACHE_ENABLED:
+            return
+
+        self.remember(key, dict(data), settings.LLM_CACHE_TTL_DAYS * 86400, tokens)
+        now = datetime.now()
+        try:
+            await db.db[CACHE_COLLECTION].update_one(
+                {"_id": key},
+                {"$set": {
+                    "data": data,
+                    "model": settings.ANALYSIS_MODEL,
+                    "prompt_version": self.version,
+                    "tokens": tokens,
+                    "created_at": now,
+                    "last_used": now,
+                }},
+                upsert=True
+            )
+        except Exception as e:
+            logger.error(f"写入分析缓存失败: {e}")
+
+    async def record_hit(self, tokens: int):
+        # 命中计数经写后缓冲合并写入，查找缓存不额外增加数据库往返
+        await db.buffer_stats({"llm_cache_hits": 1, "llm_cache_saved_tokens": tokens})
+
+    async def prune(self) -> int:
+        """条目数超过 LLM_CACHE_MAX_ENTRIES 时淘汰最久未用的条目，返回删除数量"""
+        collection = db.db[CACHE_COLLECTION]
+        excess = await collection.estimated_document_count() - settings.LLM_CACHE_MAX_ENTRIES
+        if excess <= 0:
+            return 0
+
+        cursor = collection.find({}, {"_id": 1}).sort("last_used", 1).limit(excess)
+        keys = [doc["_id"] async for doc in cursor]
+        result = await collection.delete_many({"_id": {"$in": keys}})
+        return result.deleted_count
+
+
+async def ensure_cache_indexes():
+    """缓存条目按创建时间过期，按最近使用时间淘汰"""
+    try:
+        await ensure_ttl_index(CACHE_COLLECTION, "created_at", settings.LLM_CACHE_TTL_DAYS * 86400)
+        await db.db[CACHE_COLLECTION].create_index("last_used")
+    except OperationFailure as e:
+        logger.error(f"创建分析缓存索引失败: {e}")
+
+
+# 全局分析结果缓存
+analysis_cache = AnalysisCache()
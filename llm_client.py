@@ -0,0 +1,175 @@
+"""
+按API配额限速的LLM客户端
+
+所有分析请求共用一个客户端：信号量限制同时进行的请求数，两个令牌桶分别按每分钟请求数和
+每分钟token数限速。收到429时按响应头（retry-after、x-ratelimit-reset-*）暂停所有请求，
+而不是各自盲目重试；成功响应中的 x-ratelimit-limit-* / remaining-* 用于把限速调整到
+服务商实际给出的配额，配额即将用尽时提前等待重置。
+"""
+
+import asyncio
+import random
+import re
+import time
+from typing import Dict, List, Optional
+import logging
+
+from openai import APIConnectionError, APIStatusError, AsyncOpenAI, RateLimitError
+
+from config import settings
+from http_client import TokenBucket
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 可重试的服务端状态码
+RETRY_STATUS = {500, 502, 503, 504}
+
+# x-ratelimit-reset-* 的时长格式，如 "1s"、"6m0s"、"120ms"
+DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """解析限流响应头中的时长，返回秒数"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(number) * DURATION_UNITS[unit] for number, unit in parts)
+
+
+def header_int(headers, name: str) -> Optional[int]:
+    try:
+        return int(headers.get(name))
+    except (TypeError, ValueError):
+        return None
+
+
+def estimate_tokens(messages: List[Dict], max_tokens: int) -> int:
+    """粗略估计一次请求消耗的token数：中文约一字一token，加上输出上限"""
+    return sum(len(message["content"]) for message in messages) + max_tokens
+
+
+class LLMClient:
+    """带并发限制、RPM/TPM限速和自适应退避的聊天补全客户端"""
+
+    def __init__(self):
+        # 重试由本客户端统一处理，关闭SDK自带的重试
+        self.client = AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            base_url=settings.OPENAI_BASE_URL,
+            max_retries=0
+        )
+        self.semaphore = asyncio.Semaphore(settings.ANALYSIS_CONCURRENCY)
+        self.request_bucket = self.make_bucket(settings.LLM_REQUESTS_PER_MINUTE)
+        self.token_bucket = self.make_bucket(settings.LLM_TOKENS_PER_MINUTE)
+        # 收到429或配额耗尽后，所有请求暂停到此时刻（monotonic）
+        self.paused_until = 0.0
+
+        self.stats = {"requests": 0, "rate_limited": 0, "retries": 0, "tokens": 0}
+
+    @staticmethod
+    def make_bucket(per_minute: int) -> TokenBucket:
+        rate = per_minute / 60
+        return TokenBucket(rate, max(1, int(rate * settings.LLM_BURST_SECONDS)))
+
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    async def wait_if_paused(self):
+        delay = self.paused_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def rate_limit_delay(self, headers, attempt: int) -> float:
+        """429后的等待时间：优先使用服务商给出的重置时间，否则指数退避"""
+        delay = None
+        retry_after_ms = header_int(headers, "retry-after-ms")
+        if retry_after_ms is not None:
+            delay = retry_after_ms / 1000
+        else:
+            delay = parse_duration(headers.get("retry-after"))
+        if delay is None:
+            resets = [
+                parse_duration(headers.get(name))
+                for name in ("x-ratelimit-reset-requests", "x-ratelimit-reset-tokens")
+            ]
+            resets = [reset for reset in resets if reset is not None]
+            delay = max(resets) if resets else None
+        if delay is None:
+            delay = settings.RETRY_BACKOFF_BASE * 2 ** attempt
+        # 加少量抖动，避免所有请求在同一时刻恢复
+        return min(settings.LLM_BACKOFF_MAX, delay) + random.uniform(0, 0.5)
+
+    def adapt(self, headers, estimated: int):
+        """根据响应头调整限速：采用更低的实际配额，配额即将用尽时等待重置"""
+        for bucket, limit_header in (
+            (self.request_bucket, "x-ratelimit-limit-requests"),
+            (self.token_bucket, "x-ratelimit-limit-tokens"),
+        ):
+            limit = header_int(headers, limit_header)
+            if limit and limit / 60 < bucket.rate:
+                logger.info(f"LLM配额 {limit_header}={limit} 低于配置，按实际配额限速")
+                bucket.rate = limit / 60
+                bucket.capacity = max(1, int(bucket.rate * settings.LLM_BURST_SECONDS))
+                bucket.tokens = min(bucket.tokens, bucket.capacity)
+
+        remaining_requests = header_int(headers, "x-ratelimit-remaining-requests")
+        if remaining_requests is not None and remaining_requests < 1:
+            reset = parse_duration(headers.get("x-ratelimit-reset-requests"))
+            if reset:
+                self.pause(min(settings.LLM_BACKOFF_MAX, reset))
+        remaining_tokens = header_int(headers, "x-ratelimit-remaining-tokens")
+        if remaining_tokens is not None and remaining_tokens < estimated:
+            reset = parse_duration(headers.get("x-ratelimit-reset-tokens"))
+            if reset:
+                self.pause(min(settings.LLM_BACKOFF_MAX, reset))
+
+    async def chat(self, messages: List[Dict], max_tokens: int, temperature: float,
+                   model: Optional[str] = None) -> str:
+        """发送一次聊天补全请求，按配额限速，限流和服务端错误时重试"""
+        estimated = estimate_tokens(messages, max_tokens)
+        for attempt in range(settings.LLM_MAX_RETRIES + 1):
+            async with self.semaphore:
+                await self.wait_if_paused()
+                await self.request_bucket.acquire()
+                await self.token_bucket.acquire(estimated)
+                self.stats["requests"] += 1
+                try:
+                    raw = await self.client.chat.completions.with_raw_response.create(
+                        model=model or settings.ANALYSIS_MODEL,
+                        messages=messages,
+                        temperature=temperature,
+                        max_tokens=max_tokens
+                    )
+                except RateLimitError as e:
+                    if attempt >= settings.LLM_MAX_RETRIES:
+                        raise
+                    delay = self.rate_limit_delay(e.response.headers, attempt)
+                    self.pause(delay)
+                    self.stats["rate_limited"] += 1
+                    logger.warning(f"LLM请求被限流，所有请求暂停 {delay:.1f} 秒")
+                    continue
+                except (APIConnectionError, APIStatusError) as e:
+                    status = getattr(e, "status_code", None)
+                    if attempt >= settings.LLM_MAX_RETRIES or (status is not None and status not in RETRY_STATUS):
+                        raise
+                    delay = random.uniform(0, min(settings.LLM_BACKOFF_MAX, settings.RETRY_BACKOFF_BASE * 2 ** attempt))
+                    self.stats["retries"] += 1
+                    logger.warning(f"LLM请求失败: {e}，{delay:.1f} 秒后重试")
+                else:
+                    self.adapt(raw.headers, estimated)
+                    completion = raw.parse()
+                    if completion.usage:
+                        self.stats["tokens"] += completion.usage.total_tokens
+                    return completion.choices[0].message.content
+            await asyncio.sleep(delay)
+
+
+llm_client = LLMClient()
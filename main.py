@@ -16,17 +16,40 @@ sys.path.insert(0, str(project_root))
 
 from scheduler import scheduler
 from api import app
+from replay import record_crawl, run_benchmark
+from archive import reextract_archive
+from indexes import ensure_indexes, print_index_report, verify_indexes
+from analyzer import NewsAnalyzer
+from database import db
+
+async def check_indexes() -> int:
+    """创建索引后检查执行计划，返回全集合扫描的查询数"""
+    await ensure_indexes()
+    return print_index_report(await verify_indexes())
+
+async def run_analysis_workers(count: int):
+    """在当前进程中运行多个分析协程"""
+    try:
+        await asyncio.gather(*(NewsAnalyzer().run_worker() for _ in range(count)))
+    finally:
+        await db.close()
 
 def main():
     parser = argparse.ArgumentParser(description="StockTracker - A股市场监控系统")
     parser.add_argument(
         "mode",
-        choices=["web", "scheduler", "all"],
-        help="运行模式: web(Web服务), scheduler(后台调度器), all(同时运行)"
+        choices=["web", "scheduler", "all", "record", "bench", "reextract", "indexes", "worker", "rebuild-stats"],
+        help="运行模式: web(Web服务), scheduler(后台调度器), all(同时运行), "
+             "record(录制爬虫响应), bench(离线回放爬虫性能测试), reextract(从网页归档重新抽取正文), "
+             "indexes(创建索引并检查查询执行计划), worker(新闻分析工作进程), "
+             "rebuild-stats(用聚合查询重建统计计数)"
     )
     parser.add_argument("--host", default="0.0.0.0", help="Web服务监听地址")
     parser.add_argument("--port", type=int, default=8000, help="Web服务端口")
     parser.add_argument("--reload", action="store_true", help="开发模式，自动重载")
+    parser.add_argument("--data-dir", default="replay_data", help="爬虫录制数据目录")
+    parser.add_argument("--rounds", type=int, default=3, help="性能测试轮数")
+    parser.add_argument("--workers", type=int, default=4, help="重新抽取使用的进程数 / 分析工作进程内并行的分析协程数")
     
     args = parser.parse_args()
     
@@ -45,9 +68,9 @@ def main():
     elif args.mode == "scheduler":
         print("⏰ 启动StockTracker 调度器...")
         print("🔄 定时任务:")
-        print("  • 新闻爬取: 每5分钟")
-        print("  • 新闻分析: 每10分钟")  
-        print("  • 重要警报: 每15分钟")
+        print("  • 新闻爬取: 按新闻源自适应间隔（每分钟检查）")
+        print("  • 新闻分析: 新闻入库后立即触发（每10分钟兜底检查）")
+        print("  • 重要警报: 重要分析结果生成后立即推送（每15分钟兜底检查）")
         print("  • 每日总结: 每天18:00")
         print("  • 数据清理: 每天02:00")
         
@@ -64,6 +87,35 @@ def main():
         print("请分别在两个终端中运行:")
         print(f"  终端1: python main.py scheduler")
         print(f"  终端2: python main.py web --port {args.port}")
+        
+    elif args.mode == "record":
+        print(f"⏺️ 录制爬虫响应到 {args.data_dir} ...")
+        asyncio.run(record_crawl(args.data_dir))
+        
+    elif args.mode == "bench":
+        print(f"⏱️ 使用 {args.data_dir} 中的录制数据进行爬虫性能测试...")
+        asyncio.run(run_benchmark(args.data_dir, rounds=args.rounds))
+        
+    elif args.mode == "reextract":
+        print("♻️ 从网页归档重新抽取正文...")
+        asyncio.run(reextract_archive(workers=args.workers))
+        
+    elif args.mode == "indexes":
+        print("🔍 创建索引并检查热点查询的执行计划...")
+        collscans = asyncio.run(check_indexes())
+        sys.exit(1 if collscans else 0)
+        
+    elif args.mode == "worker":
+        print(f"🧠 启动新闻分析工作进程（{args.workers} 个并行分析协程）...")
+        print("  可在多个终端或主机上同时运行，新闻通过租约认领，不会重复分析")
+        try:
+            asyncio.run(run_analysis_workers(args.workers))
+        except KeyboardInterrupt:
+            print("\n🛑 分析工作进程已停止")
+            
+    elif args.mode == "rebuild-stats":
+        print("📊 用聚合查询重建统计计数...")
+        asyncio.run(db.rebuild_stats())
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -1,39 +1,57 @@
 from datetime import datetime
-from typing import List, Optional
-from pydantic import BaseModel, Field
+from typing import Annotated, Any, Dict, List, Optional
+from pydantic import BaseModel, ConfigDict, Field, PlainSerializer, PlainValidator, TypeAdapter, WithJsonSchema
 from bson import ObjectId
 
-class PyObjectId(ObjectId):
-    @classmethod
-    def __get_validators__(cls):
-        yield cls.validate
+def validate_object_id(value: Any) -> ObjectId:
+    if isinstance(value, ObjectId):
+        return value
+    if isinstance(value, str) and ObjectId.is_valid(value):
+        return ObjectId(value)
+    raise ValueError("Invalid objectid")
 
-    @classmethod
-    def validate(cls, v):
-        if not ObjectId.is_valid(v):
-            raise ValueError("Invalid objectid")
-        return ObjectId(v)
+def serialize_object_id(value: ObjectId) -> str:
+    return str(value)
 
-    @classmethod
-    def __modify_schema__(cls, field_schema):
-        field_schema.update(type="string")
+# MongoDB ObjectId：Python模式下保持ObjectId写入数据库，JSON输出和接口文档中为字符串
+PyObjectId = Annotated[
+    ObjectId,
+    PlainValidator(validate_object_id),
+    PlainSerializer(serialize_object_id, when_used="json"),
+    WithJsonSchema({"type": "string"}),
+]
+
+# 允许用字段名或 _id 别名构造模型
+MONGO_MODEL_CONFIG = ConfigDict(populate_by_name=True)
 
 class NewsSource(BaseModel):
-    id: PyObjectId = Field(default_factory=PyObjectId, alias="_id")
+    id: PyObjectId = Field(default_factory=ObjectId, alias="_id")
     name: str
     url: str
     source_type: str  # news, official, wechat
     is_active: bool = True
+    
+    # 列表页抽取规则，由通用抽取引擎执行
+    listing_format: str = "rss"  # rss, html, json
+    listing_url: Optional[str] = None  # 为空时使用url
+    item_selector: Optional[str] = None  # html: 条目选择器
+    link_selector: str = "a"  # html: 条目内链接选择器
+    time_selector: Optional[str] = None  # html: 条目内时间选择器
+    json_items_path: Optional[str] = None  # json: 条目数组路径，如 result.data
+    json_fields: Dict[str, str] = {}  # json: title/url/time 对应的字段名
+    time_format: Optional[str] = None  # strptime格式或timestamp，为空时自动识别
+    
     last_crawled: Optional[datetime] = None
-    crawl_interval: int = 300  # 秒
+    crawl_interval: int = 300  # 秒，根据新内容产出自适应调整
+    next_crawl_time: Optional[datetime] = None
+    etag: Optional[str] = None  # 列表页条件请求校验
+    last_modified: Optional[str] = None
+    content_hash: Optional[str] = None  # 列表页内容哈希，用于跳过未变化的页面
     
-    class Config:
-        allow_population_by_field_name = True
-        arbitrary_types_allowed = True
-        json_encoders = {ObjectId: str}
+    model_config = MONGO_MODEL_CONFIG
 
 class NewsItem(BaseModel):
-    id: PyObjectId = Field(default_factory=PyObjectId, alias="_id")
+    id: PyObjectId = Field(default_factory=ObjectId, alias="_id")
     title: str
     content: str
     url: str
@@ -42,14 +60,15 @@ class NewsItem(BaseModel):
     publish_time: datetime
     crawl_time: datetime = Field(default_factory=datetime.now)
     is_processed: bool = False
+    simhash: Optional[int] = None  # 标题+正文的SimHash（有符号64位）
+    canonical_id: Optional[PyObjectId] = None  # 近似重复时指向最早入库的原始新闻
+    lease_owner: Optional[str] = None  # 正在分析该新闻的工作进程
+    lease_expires: Optional[datetime] = None  # 分析租约到期时间
     
-    class Config:
-        allow_population_by_field_name = True
-        arbitrary_types_allowed = True
-        json_encoders = {ObjectId: str}
+    model_config = MONGO_MODEL_CONFIG
 
 class AnalysisResult(BaseModel):
-    id: PyObjectId = Field(default_factory=PyObjectId, alias="_id")
+    id: PyObjectId = Field(default_factory=ObjectId, alias="_id")
     news_id: PyObjectId
     sentiment_score: int  # 1-10
     sentiment_desc: str
@@ -60,27 +79,22 @@ class AnalysisResult(BaseModel):
     importance: int  # 1-5星
     summary: str
     analysis_time: datetime = Field(default_factory=datetime.now)
+    reused_from: Optional[PyObjectId] = None  # 复用原始新闻分析结果时，原分析结果的ID
     
-    class Config:
-        allow_population_by_field_name = True
-        arbitrary_types_allowed = True
-        json_encoders = {ObjectId: str}
+    model_config = MONGO_MODEL_CONFIG
 
 class StockInfo(BaseModel):
-    id: PyObjectId = Field(default_factory=PyObjectId, alias="_id")
+    id: PyObjectId = Field(default_factory=ObjectId, alias="_id")
     code: str
     name: str
     sector: str
     concepts: List[str]
     market: str  # SH/SZ
     
-    class Config:
-        allow_population_by_field_name = True
-        arbitrary_types_allowed = True
-        json_encoders = {ObjectId: str}
+    model_config = MONGO_MODEL_CONFIG
 
 class Subscriber(BaseModel):
-    id: PyObjectId = Field(default_factory=PyObjectId, alias="_id")
+    id: PyObjectId = Field(default_factory=ObjectId, alias="_id")
     user_id: str
     platform: str  # telegram, wechat, email
     chat_id: str
@@ -90,13 +104,10 @@ class Subscriber(BaseModel):
     interested_stocks: List[str] = []
     created_time: datetime = Field(default_factory=datetime.now)
     
-    class Config:
-        allow_population_by_field_name = True
-        arbitrary_types_allowed = True
-        json_encoders = {ObjectId: str}
+    model_config = MONGO_MODEL_CONFIG
 
 class Alert(BaseModel):
-    id: PyObjectId = Field(default_factory=PyObjectId, alias="_id")
+    id: PyObjectId = Field(default_factory=ObjectId, alias="_id")
     news_id: PyObjectId
     analysis_id: PyObjectId
     title: str
@@ -105,7 +116,11 @@ class Alert(BaseModel):
     sent_to: List[str] = []
     created_time: datetime = Field(default_factory=datetime.now)
     
-    class Config:
-        allow_population_by_field_name = True
-        arbitrary_types_allowed = True
-        json_encoders = {ObjectId: str} 
\ No newline at end of file
+    model_config = MONGO_MODEL_CONFIG
+
+# 列表的批量校验和序列化
+NewsItemList = TypeAdapter(List[NewsItem])
+AnalysisResultList = TypeAdapter(List[AnalysisResult])
+StockInfoList = TypeAdapter(List[StockInfo])
+SubscriberList = TypeAdapter(List[Subscriber])
+NewsSourceList = TypeAdapter(List[NewsSource])
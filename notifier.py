@@ -20,26 +20,37 @@ class NotificationManager:
             self.telegram_bot = Bot(token=settings.TELEGRAM_BOT_TOKEN)
     
     async def send_important_alerts(self):
-        """发送重要警报"""
+        """发送重要警报（定时检查最近的重要分析结果，已发过警报的会跳过）"""
         try:
             # 获取重要分析结果
-            important_analysis = await db.get_important_analysis(min_importance=4)
+            important_analysis = await db.get_important_analysis(
+                min_importance=settings.ALERT_MIN_IMPORTANCE, limit=50
+            )
             
             for analysis in important_analysis:
-                # 这里暂时简化，实际需要实现get_news_by_id方法
-                news_item = NewsItem(
-                    title="重要消息",
-                    content="",
-                    url="",
-                    source_name="系统",
-                    source_type="system",
-                    publish_time=datetime.now()
-                )
-                await self.create_and_send_alert(news_item, analysis)
+                await self.send_analysis_alert(analysis)
                     
         except Exception as e:
             logger.error(f"发送重要警报时出错: {e}")
     
+    async def send_analysis_alert(self, analysis: AnalysisResult):
+        """为一条分析结果发送警报"""
+        # 复用原始新闻分析结果的转载新闻不重复推送
+        if analysis.reused_from or analysis.importance < settings.ALERT_MIN_IMPORTANCE:
+            return
+        
+        news_item = await db.get_news_by_id(str(analysis.news_id))
+        if news_item is None:
+            news_item = NewsItem(
+                title="重要消息",
+                content="",
+                url="",
+                source_name="系统",
+                source_type="system",
+                publish_time=datetime.now()
+            )
+        await self.create_and_send_alert(news_item, analysis)
+    
     async def create_and_send_alert(self, news_item: NewsItem, analysis: AnalysisResult):
         """创建并发送警报"""
         try:
@@ -54,7 +65,9 @@ class NotificationManager:
                 importance=analysis.importance
             )
             
-            alert_id = await db.create_alert(alert)
+            alert_id = await db.create_alert_once(alert)
+            if alert_id is None:
+                return
             
             # 获取订阅者并发送
             subscribers = await db.get_active_subscribers()
@@ -0,0 +1,128 @@
+"""
+事件驱动的处理流水线
+
+新闻入库后立即唤醒分析器，新的重要分析结果立即唤醒通知器，不必等待定时任务轮询。
+MongoDB为副本集时使用变更流（可跨进程、跨主机感知写入）；单机部署不支持变更流，
+此时退回到进程内事件队列，只能感知本进程（调度器中的爬虫和分析器）的写入。
+定时任务仍然保留，用于补上遗漏的事件。
+"""
+
+import asyncio
+from typing import Dict, Optional
+import logging
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+from config import settings
+from models import AnalysisResult
+from database import db
+from analyzer import NewsAnalyzer
+from notifier import notifier
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 变更流断开后重连前的等待时间（秒）
+RECONNECT_DELAY = 5
+
+
+class EventPipeline:
+    """新闻入库唤醒分析器，重要分析结果唤醒通知器"""
+
+    def __init__(self):
+        self.analyzer = NewsAnalyzer()
+        self.news_wakeup = asyncio.Event()
+        self.alert_queue: asyncio.Queue = asyncio.Queue()
+        self.resume_tokens: Dict[str, Optional[Dict]] = {}
+        self.mode = None
+
+    async def run(self):
+        if await self.change_streams_supported():
+            self.mode = "change_stream"
+            sources = [self.watch_news(), self.watch_analysis()]
+        else:
+            self.mode = "local"
+            sources = [self.consume_local_news(), self.consume_local_analysis()]
+        logger.info(f"事件流水线启动，事件来源: {self.mode}")
+
+        await asyncio.gather(*sources, self.analysis_loop(), self.alert_loop())
+
+    async def change_streams_supported(self) -> bool:
+        """单机MongoDB不支持变更流，连接失败等其他错误时同样退回进程内事件队列"""
+        try:
+            async with db.db.news_items.watch(max_await_time_ms=100) as stream:
+                await stream.try_next()
+            return True
+        except OperationFailure as e:
+            logger.info(f"MongoDB不支持变更流，使用进程内事件队列: {e}")
+            return False
+        except PyMongoError as e:
+            logger.error(f"检查变更流支持时出错，使用进程内事件队列: {e}")
+            return False
+
+    async def watch(self, name: str, collection, pipeline, handle):
+        """监听集合变更，断开后从上次的位置恢复"""
+        while True:
+            try:
+                async with collection.watch(pipeline, resume_after=self.resume_tokens.get(name)) as stream:
+                    async for change in stream:
+                        self.resume_tokens[name] = stream.resume_token
+                        await handle(change)
+            except PyMongoError as e:
+                logger.error(f"{name} 变更流中断: {e}，{RECONNECT_DELAY} 秒后重连")
+                await asyncio.sleep(RECONNECT_DELAY)
+
+    async def watch_news(self):
+        async def handle(change):
+            self.news_wakeup.set()
+
+        await self.watch("news_items", db.db.news_items, [{"$match": {"operationType": "insert"}}], handle)
+
+    async def watch_analysis(self):
+        pipeline = [{"$match": {
+            "operationType": "insert",
+            "fullDocument.importance": {"$gte": settings.ALERT_MIN_IMPORTANCE},
+            "fullDocument.reused_from": None
+        }}]
+
+        async def handle(change):
+            await self.alert_queue.put(AnalysisResult.model_validate(change["fullDocument"]))
+
+        await self.watch("analysis_results", db.db.analysis_results, pipeline, handle)
+
+    async def consume_local_news(self):
+        queue = db.subscribe_events("news_inserted")
+        while True:
+            await queue.get()
+            self.news_wakeup.set()
+
+    async def consume_local_analysis(self):
+        queue = db.subscribe_events("analysis_created")
+        while True:
+            analysis = await queue.get()
+            if analysis.importance >= settings.ALERT_MIN_IMPORTANCE and not analysis.reused_from:
+                await self.alert_queue.put(analysis)
+
+    async def analysis_loop(self):
+        """有新闻入库时认领并分析待处理新闻"""
+        while True:
+            await self.news_wakeup.wait()
+            # 等待同一轮爬取的新闻入库完成，合并为一次分析
+            await asyncio.sleep(settings.PIPELINE_DEBOUNCE_SECONDS)
+            self.news_wakeup.clear()
+            try:
+                results = await self.analyzer.analyze_all_unprocessed()
+                if len(results) >= settings.ANALYSIS_BATCH_SIZE:
+                    # 可能还有积压，继续处理
+                    self.news_wakeup.set()
+            except Exception as e:
+                logger.error(f"事件触发的新闻分析出错: {e}")
+
+    async def alert_loop(self):
+        """收到重要分析结果时立即发送警报"""
+        while True:
+            analysis = await self.alert_queue.get()
+            try:
+                await notifier.send_analysis_alert(analysis)
+            except Exception as e:
+                logger.error(f"事件触发的警报发送出错: {e}")
@@ -0,0 +1,136 @@
+"""
+爬虫录制回放与性能测试
+
+record: 实际爬取内置新闻源，把列表页和正文页的响应保存到本地目录（不写数据库）
+bench:  启动本地aiohttp回放服务器，用录制数据离线运行爬虫并输出性能报告
+"""
+
+import asyncio
+import hashlib
+import json
+import math
+import time
+from pathlib import Path
+from typing import Dict, List
+import logging
+
+from aiohttp import web
+
+from crawler import DEFAULT_SOURCES, NewsCrawler, SourceMetrics
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class ResponseRecorder:
+    """把HTTP响应按URL保存到录制目录"""
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self.body_dir = self.directory / "bodies"
+        self.body_dir.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.directory / "index.json"
+        self.index: Dict[str, Dict] = {}
+        if self.index_path.exists():
+            self.index = json.loads(self.index_path.read_text(encoding="utf-8"))
+
+    def record(self, url: str, status: int, headers, body: bytes):
+        filename = hashlib.sha1(url.encode("utf-8")).hexdigest() + ".bin"
+        (self.body_dir / filename).write_bytes(body)
+        self.index[url] = {
+            "file": filename,
+            "status": status,
+            "content_type": headers.get("Content-Type", "application/octet-stream"),
+        }
+
+    def save(self):
+        self.index_path.write_text(json.dumps(self.index, ensure_ascii=False, indent=2), encoding="utf-8")
+
+class ReplayServer:
+    """本地回放服务器：GET /replay?url=<原始URL> 返回录制的响应"""
+
+    def __init__(self, directory: str, host: str = "127.0.0.1", port: int = 0):
+        self.directory = Path(directory)
+        self.host = host
+        self.port = port
+        self.index: Dict[str, Dict] = json.loads((self.directory / "index.json").read_text(encoding="utf-8"))
+        self.bodies: Dict[str, bytes] = {}
+        self.runner = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def handle(self, request: web.Request) -> web.Response:
+        entry = self.index.get(request.query.get("url", ""))
+        if not entry:
+            return web.Response(status=404)
+
+        body = self.bodies.get(entry["file"])
+        if body is None:
+            body = (self.directory / "bodies" / entry["file"]).read_bytes()
+            self.bodies[entry["file"]] = body
+
+        return web.Response(status=entry["status"], body=body, headers={"Content-Type": entry["content_type"]})
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/replay", self.handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, self.host, self.port).start()
+        self.port = self.runner.addresses[0][1]
+
+    async def stop(self):
+        if self.runner:
+            await self.runner.cleanup()
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(p / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+async def crawl_default_sources(crawler: NewsCrawler) -> int:
+    """用内置新闻源定义爬取一轮（使用副本，避免校验信息影响下一轮）"""
+    sources = [source.model_copy(deep=True) for source in DEFAULT_SOURCES]
+    results = await asyncio.gather(*(crawler.crawl_source(source) for source in sources))
+    return sum(results)
+
+async def record_crawl(directory: str):
+    """实际爬取并录制响应"""
+    recorder = ResponseRecorder(directory)
+    async with NewsCrawler(dry_run=True, recorder=recorder) as crawler:
+        total = await crawl_default_sources(crawler)
+    recorder.save()
+    logger.info(f"录制完成: {total} 条新闻，{len(recorder.index)} 个响应，保存在 {directory}")
+
+def print_report(metrics: Dict[str, SourceMetrics], elapsed: float, rounds: int):
+    total_items = sum(m.items for m in metrics.values())
+    print(f"\n共 {rounds} 轮，耗时 {elapsed:.2f}s，{total_items} 条新闻，{total_items / elapsed:.1f} 条/秒\n")
+    print(f"{'新闻源':<12}{'条数':>8}{'请求数':>8}{'p50(ms)':>10}{'p99(ms)':>10}{'解析(ms)':>10}{'解析/条(ms)':>12}")
+    for name, m in sorted(metrics.items()):
+        per_item = m.parse_seconds * 1000 / m.items if m.items else 0.0
+        print(f"{name:<12}{m.items:>8}{len(m.fetch_latencies):>8}"
+              f"{percentile(m.fetch_latencies, 50) * 1000:>10.1f}"
+              f"{percentile(m.fetch_latencies, 99) * 1000:>10.1f}"
+              f"{m.parse_seconds * 1000:>10.1f}{per_item:>12.2f}")
+
+async def run_benchmark(directory: str, rounds: int = 3):
+    """用录制数据离线运行爬虫并输出性能报告"""
+    server = ReplayServer(directory)
+    await server.start()
+    try:
+        metrics: Dict[str, SourceMetrics] = {}
+        start = time.perf_counter()
+        for _ in range(rounds):
+            async with NewsCrawler(dry_run=True, replay_url=server.url) as crawler:
+                await crawl_default_sources(crawler)
+            for name, m in crawler.metrics.items():
+                merged = metrics.setdefault(name, SourceMetrics())
+                merged.items += m.items
+                merged.fetch_latencies.extend(m.fetch_latencies)
+                merged.parse_seconds += m.parse_seconds
+        print_report(metrics, time.perf_counter() - start, rounds)
+    finally:
+        await server.stop()
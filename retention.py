@@ -0,0 +1,130 @@
+"""
+数据保留
+
+news_items、analysis_results、alerts 超过 RETENTION_DAYS 的文档由每日清理任务分批移出：
+每批文档编码为BSON后整体zstd压缩，写入 archived_batches 集合的一条记录，再从原集合删除，
+批次之间暂停以免清理抢占在线查询的IO。原集合上的TTL索引（保留天数 + 宽限天数）只作兜底，
+正常情况下文档在此之前已被归档；归档记录本身由TTL索引在 RETENTION_ARCHIVE_DAYS 后删除。
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+from typing import Dict, List
+import logging
+
+import bson
+import zstandard
+from bson import Binary
+from pymongo import ASCENDING
+from pymongo.errors import OperationFailure
+
+from config import settings
+from database import db
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ARCHIVE_COLLECTION = "archived_batches"
+
+# 各集合判断过期所用的时间字段
+RETENTION_TIME_FIELDS = {
+    "news_items": "crawl_time",
+    "analysis_results": "analysis_time",
+    "alerts": "created_time",
+}
+
+# 索引选项冲突（TTL时长变化）的错误码
+INDEX_OPTIONS_CONFLICT = 85
+
+
+async def ensure_ttl_index(collection: str, field: str, expire_seconds: int):
+    """创建TTL索引，保留时长配置变化时用collMod更新"""
+    try:
+        await db.db[collection].create_index([(field, ASCENDING)], expireAfterSeconds=expire_seconds)
+    except OperationFailure as e:
+        if e.code != INDEX_OPTIONS_CONFLICT:
+            raise
+        await db.db.command({
+            "collMod": collection,
+            "index": {"keyPattern": {field: 1}, "expireAfterSeconds": expire_seconds}
+        })
+
+
+async def ensure_retention_indexes():
+    """为各集合和归档集合创建TTL索引"""
+    for collection, days in settings.RETENTION_DAYS.items():
+        field = RETENTION_TIME_FIELDS.get(collection)
+        if not field:
+            logger.warning(f"集合 {collection} 没有配置保留时间字段，跳过")
+            continue
+        try:
+            expire_days = days + settings.RETENTION_TTL_GRACE_DAYS
+            await ensure_ttl_index(collection, field, expire_days * 86400)
+        except OperationFailure as e:
+            logger.error(f"创建 {collection} TTL索引失败: {e}")
+
+    try:
+        await ensure_ttl_index(ARCHIVE_COLLECTION, "archived_at", settings.RETENTION_ARCHIVE_DAYS * 86400)
+        await db.db[ARCHIVE_COLLECTION].create_index([("collection", ASCENDING), ("to", ASCENDING)])
+    except OperationFailure as e:
+        logger.error(f"创建归档集合索引失败: {e}")
+
+
+def compress_documents(docs: List[Dict]) -> bytes:
+    return zstandard.ZstdCompressor(level=settings.ARCHIVE_COMPRESSION_LEVEL).compress(
+        b"".join(bson.encode(doc) for doc in docs)
+    )
+
+
+def load_archived_batch(record: Dict) -> List[Dict]:
+    """解压一条归档记录，返回原始文档"""
+    return bson.decode_all(zstandard.ZstdDecompressor().decompress(record["data"]))
+
+
+async def archive_expired(collection: str, days: int) -> int:
+    """把超过保留期的文档分批压缩归档并从原集合删除，返回归档数量"""
+    field = RETENTION_TIME_FIELDS[collection]
+    cutoff = datetime.now() - timedelta(days=days)
+    archived = 0
+
+    while True:
+        cursor = db.db[collection].find({field: {"$lt": cutoff}}).sort(field, ASCENDING).limit(
+            settings.RETENTION_BATCH_SIZE
+        )
+        docs = await cursor.to_list(length=settings.RETENTION_BATCH_SIZE)
+        if not docs:
+            break
+
+        # 先写归档再删除，中途失败最多重复归档，不会丢数据
+        await db.db[ARCHIVE_COLLECTION].insert_one({
+            "collection": collection,
+            "from": docs[0][field],
+            "to": docs[-1][field],
+            "count": len(docs),
+            "archived_at": datetime.now(),
+            "data": Binary(compress_documents(docs)),
+        })
+        result = await db.db[collection].delete_many({"_id": {"$in": [doc["_id"] for doc in docs]}})
+        archived += result.deleted_count
+
+        if len(docs) < settings.RETENTION_BATCH_SIZE:
+            break
+        await asyncio.sleep(settings.RETENTION_BATCH_PAUSE)
+
+    return archived
+
+
+async def run_retention() -> Dict[str, int]:
+    """按各集合的保留天数归档过期数据"""
+    await ensure_retention_indexes()
+
+    summary = {}
+    for collection, days in settings.RETENTION_DAYS.items():
+        if collection not in RETENTION_TIME_FIELDS:
+            continue
+        try:
+            summary[collection] = await archive_expired(collection, days)
+            logger.info(f"{collection}: 归档 {summary[collection]} 条 {days} 天前的数据")
+        except Exception as e:
+            logger.error(f"归档 {collection} 时出错: {e}")
+    return summary
@@ -1,12 +1,17 @@
 import asyncio
 import schedule
 import time
-from datetime import datetime
 import logging
 
 from crawler import NewsCrawler, init_news_sources
 from analyzer import NewsAnalyzer, init_stock_data
 from notifier import notifier
+from database import db
+from indexes import bootstrap_indexes
+from retention import ensure_retention_indexes, run_retention
+from pipeline import EventPipeline
+from llm_cache import analysis_cache, ensure_cache_indexes
+from config import settings
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -14,6 +19,7 @@ logger = logging.getLogger(__name__)
 class TaskScheduler:
     def __init__(self):
         self.is_running = False
+        self.running_tasks = {}
         
     async def start(self):
         """启动调度器"""
@@ -26,10 +32,29 @@ class TaskScheduler:
         # 设置定时任务
         self.setup_schedules()
         
-        # 运行调度循环
-        while self.is_running:
-            schedule.run_pending()
-            await asyncio.sleep(1)
+        # 新闻入库和重要分析结果即时触发后续处理，定时任务作为兜底
+        pipeline_task = None
+        if settings.PIPELINE_EVENTS_ENABLED:
+            pipeline_task = asyncio.get_running_loop().create_task(EventPipeline().run())
+            pipeline_task.add_done_callback(self.on_pipeline_done)
+        
+        # 运行调度循环，退出时写入缓冲中的状态更新
+        try:
+            while self.is_running:
+                schedule.run_pending()
+                await asyncio.sleep(1)
+        finally:
+            if pipeline_task:
+                pipeline_task.cancel()
+            await db.close()
+    
+    def on_pipeline_done(self, task: asyncio.Task):
+        """事件流水线意外退出时记录异常，之后由定时任务兜底处理"""
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error:
+            logger.error(f"事件流水线异常退出: {error}")
     
     def stop(self):
         """停止调度器"""
@@ -40,6 +65,10 @@ class TaskScheduler:
         """初始化基础数据"""
         try:
             logger.info("初始化基础数据...")
+            await bootstrap_indexes()
+            await ensure_retention_indexes()
+            await ensure_cache_indexes()
+            await db.check_stats()
             await init_news_sources()
             await init_stock_data()
             logger.info("基础数据初始化完成")
@@ -48,8 +77,8 @@ class TaskScheduler:
     
     def setup_schedules(self):
         """设置定时任务"""
-        # 新闻爬取 - 每5分钟
-        schedule.every(5).minutes.do(self.run_async_task, self.crawl_news_task)
+        # 新闻爬取 - 每分钟检查一次，各新闻源按自身间隔到期后才爬取
+        schedule.every(1).minutes.do(self.run_async_task, self.crawl_news_task)
         
         # 新闻分析 - 每10分钟
         schedule.every(10).minutes.do(self.run_async_task, self.analyze_news_task)
@@ -66,12 +95,14 @@ class TaskScheduler:
         logger.info("定时任务设置完成")
     
     def run_async_task(self, coro):
-        """运行异步任务"""
+        """在调度器的事件循环中运行异步任务，上一次未结束时跳过本次"""
         try:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            loop.run_until_complete(coro())
-            loop.close()
+            name = coro.__name__
+            task = self.running_tasks.get(name)
+            if task and not task.done():
+                logger.info(f"任务 {name} 仍在运行，跳过本次调度")
+                return
+            self.running_tasks[name] = asyncio.get_running_loop().create_task(coro())
         except Exception as e:
             logger.error(f"执行异步任务时出错: {e}")
     
@@ -117,12 +148,10 @@ class TaskScheduler:
         """清理任务"""
         try:
             logger.info("开始执行数据清理任务")
-            # 清理30天前的新闻和分析结果
-            from datetime import timedelta
-            cutoff_date = datetime.now() - timedelta(days=30)
-            
-            # 这里可以添加具体的清理逻辑
-            logger.info("数据清理完成")
+            # 超过保留期的新闻、分析结果和警报压缩归档后移出在线集合
+            summary = await run_retention()
+            pruned = await analysis_cache.prune()
+            logger.info(f"数据清理完成，共归档 {sum(summary.values())} 条，淘汰 {pruned} 条分析缓存")
         except Exception as e:
             logger.error(f"数据清理任务出错: {e}")
 